@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time-to-identify ของ IdentityVoter เทียบกับ majority count แบบเดิม (sliding window 5 วินาที)
+รัน model บน video ที่อัดไว้ครั้งเดียว แล้ว replay detections ผ่านทั้งสองวิธีด้วยเวลาตาม clip (ไม่ขึ้นกับความเร็ว inference)
+
+Usage:
+    python benchmark_identity.py clip1.mp4 clip2.mp4
+    python benchmark_identity.py clip1.mp4=Poom clip2.mp4=Frame --model last.pt
+"""
+
+import argparse
+import os
+import time
+from collections import Counter, deque
+
+from identity import IdentityVoter, IDENTITY_HALF_LIFE, IDENTITY_DECISION_MARGIN, IDENTITY_MIN_EVIDENCE
+from model_manager import get_device
+
+LEGACY_HISTORY_WINDOW = 5  # seconds - window ของวิธีเดิม
+
+
+def extract_detections(model, path: str, conf: float) -> tuple[list[list[tuple[str, float]]], float]:
+    """Run the model over every frame of a clip; returns per-frame (label, conf) lists and the clip FPS"""
+    import cv2  # imported here so the replay functions can be used without the vision stack
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    device = get_device()
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        results = model(frame, device=device, verbose=False, conf=conf)
+        boxes = results[0].boxes
+        frames.append([(model.names[int(c)], float(p)) for c, p in zip(boxes.cls.tolist(), boxes.conf.tolist())])
+    cap.release()
+    return frames, fps
+
+
+def replay_legacy(frames, fps) -> list[str]:
+    """Original behaviour: most common class in the last 5 seconds, every detection counts 1"""
+    history = deque()
+    predictions = []
+    for i, detections in enumerate(frames):
+        now = i / fps
+        while history and history[0][0] < now - LEGACY_HISTORY_WINDOW:
+            history.popleft()
+        for label, _ in detections:
+            history.append((now, label))
+        predictions.append(Counter(label for _, label in history).most_common(1)[0][0] if history else "")
+    return predictions
+
+
+def replay_voter(frames, fps, half_life, margin, min_evidence) -> list[str]:
+    """IdentityVoter: only a decided identity counts as identified"""
+    voter = IdentityVoter(half_life, margin, min_evidence)
+    predictions = []
+    for i, detections in enumerate(frames):
+        voter.update(detections, i / fps)
+        predictions.append(voter.decided)
+    return predictions
+
+
+def settle_index(predictions: list[str], expected: str) -> int | None:
+    """First frame after which the prediction stays `expected` until the end of the clip"""
+    settled = None
+    for i, label in enumerate(predictions):
+        if label == expected:
+            if settled is None:
+                settled = i
+        else:
+            settled = None
+    return settled
+
+
+def flips(predictions: list[str]) -> int:
+    shown = [p for p in predictions if p]
+    return sum(1 for a, b in zip(shown, shown[1:]) if a != b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Identity voting benchmark on recorded clips")
+    parser.add_argument('clips', nargs='+', help="video files, optionally 'path=expected_label'")
+    parser.add_argument('--model', default=os.getenv("MODEL_PATH", "last.pt"))
+    parser.add_argument('--conf', type=float, default=0.25, help="detection confidence threshold")
+    parser.add_argument('--half-life', type=float, default=IDENTITY_HALF_LIFE)
+    parser.add_argument('--margin', type=float, default=IDENTITY_DECISION_MARGIN)
+    parser.add_argument('--min-evidence', type=float, default=IDENTITY_MIN_EVIDENCE)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+
+    print(f"{'Clip':<30} {'Expected':<18} {'Legacy (frames / s)':>20} {'Voter (frames / s)':>20} {'Flips L/V':>10}")
+    print("-" * 102)
+    for spec in args.clips:
+        path, _, expected = spec.partition('=')
+        start = time.time()
+        frames, fps = extract_detections(model, path, args.conf)
+        if not expected:
+            # No label given: use the identity with the highest total confidence over the clip
+            totals = Counter()
+            for detections in frames:
+                for label, conf in detections:
+                    totals[label] += conf
+            expected = totals.most_common(1)[0][0] if totals else ""
+
+        legacy = replay_legacy(frames, fps)
+        voter = replay_voter(frames, fps, args.half_life, args.margin, args.min_evidence)
+        cells = []
+        for predictions in (legacy, voter):
+            index = settle_index(predictions, expected)
+            cells.append(f"{index} / {index / fps:.2f}" if index is not None else "never")
+        print(f"{os.path.basename(path):<30} {expected:<18} {cells[0]:>20} {cells[1]:>20} "
+              f"{flips(legacy):>4}/{flips(voter):<5}  ({len(frames)} frames, inference {time.time() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Pluggable frame sources for the detection loop
+แต่ละ source มี grabber thread ที่อ่าน frame ตลอดเวลาและเก็บไว้เฉพาะ frame ล่าสุด
+(ไม่มี frame ค้างใน buffer ของ OpenCV) พร้อม timestamp, จำนวน frame ที่ drop และ reconnect อัตโนมัติ
+
+Supported sources (ดู create_source):
+- Local device:    "0", "1", ...
+- Network stream:  "rtsp://...", "http://...", "https://..."
+- Video file:      "clip.mp4" (loop และ/หรือ real-time pacing)
+- Image sequence:  directory หรือ glob pattern เช่น "frames/*.jpg"
+"""
+
+import glob
+import logging
+import os
+import threading
+import time
+
+import cv2
+
+from log_pipeline import HotPathLogger
+
+logger = logging.getLogger(__name__)
+hot_logger = HotPathLogger(logger)  # reconnect warnings repeat for as long as a source is down
+
+RECONNECT_MIN_DELAY = 0.5   # seconds
+RECONNECT_MAX_DELAY = 10.0  # seconds
+DEFAULT_SEQUENCE_FPS = 30.0
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class Frame:
+    """A captured frame with its sequence number and capture time"""
+
+    def __init__(self, index: int, image, timestamp: float):
+        self.index = index
+        self.image = image
+        self.timestamp = timestamp
+
+
+class FrameSource:
+    """
+    Base class: runs a grabber thread that keeps only the newest frame.
+
+    Subclasses implement _open(), _grab() and _close(). `paced` sources (files, image
+    sequences) sleep between frames; live sources block on the device instead.
+    """
+
+    kind = "source"
+
+    def __init__(self, name: str, realtime: bool = True):
+        self.name = name
+        # realtime=False -> grabber waits for the consumer, so every frame is processed (offline runs)
+        self.realtime = realtime
+
+        self._cond = threading.Condition()
+        self._latest: Frame | None = None
+        self._consumed = True
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self.connected = False
+        self.finished = False
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.reconnects = 0
+        self.last_error: str | None = None
+
+    # ----- subclass hooks -----
+    def _open(self) -> bool:
+        raise NotImplementedError
+
+    def _grab(self):
+        """Return (ok, image). ok=False triggers a reconnect."""
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def _frame_interval(self) -> float:
+        """Seconds between frames for paced sources (0 = live source, no pacing)"""
+        return 0.0
+
+    # ----- lifecycle -----
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"grabber-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if wait and self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        logger.info("Frame source stopped: %s", self.name)
+
+    def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop.is_set() and not self.finished:
+            try:
+                opened = self._open()
+            except Exception as e:
+                self.last_error = str(e)
+                opened = False
+            if not opened:
+                self.connected = False
+                hot_logger.warning("⚠ Cannot open frame source %s, retrying in %.1fs", self.name, delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                self.reconnects += 1
+                continue
+
+            self.connected = True
+            logger.info("Frame source opened: %s", self.name)
+            published = self._grab_loop()
+            self.connected = False
+            self._close()
+            if self._stop.is_set() or self.finished:
+                break
+
+            # Read failed: back off before reopening. Only a source that actually delivered
+            # frames resets the delay, so one that opens fine but never reads keeps backing off
+            if published:
+                delay = RECONNECT_MIN_DELAY
+            self._stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            self.reconnects += 1
+
+        with self._cond:
+            self._cond.notify_all()
+
+    def _grab_loop(self) -> int:
+        """Read frames until stopped or a read fails; returns the number of frames published"""
+        interval = self._frame_interval()
+        next_time = time.time()
+        published = 0
+        while not self._stop.is_set():
+            if not self.realtime:
+                # Lockstep: wait until the consumer has taken the previous frame
+                with self._cond:
+                    self._cond.wait_for(lambda: self._consumed or self._stop.is_set())
+                if self._stop.is_set():
+                    break
+            try:
+                ok, image = self._grab()
+            except Exception as e:
+                self.last_error = str(e)
+                ok, image = False, None
+            if not ok:
+                if self.finished:
+                    logger.info("Frame source ended: %s", self.name)
+                else:
+                    self.read_failures += 1
+                    hot_logger.warning("⚠ Read failed on frame source %s, reconnecting", self.name)
+                break
+            self._publish(image)
+            published += 1
+
+            if interval and self.realtime:
+                next_time += interval
+                sleep = next_time - time.time()
+                if sleep > 0:
+                    self._stop.wait(sleep)
+                else:
+                    next_time = time.time()  # fell behind, don't try to catch up
+        return published
+
+    def _publish(self, image):
+        with self._cond:
+            if not self._consumed:
+                self.frames_dropped += 1
+            self.frames_captured += 1
+            self._latest = Frame(self.frames_captured, image, time.time())
+            self._consumed = False
+            self._cond.notify_all()
+
+    # ----- consumer side -----
+    def wait_frame(self, last_index: int | None = None, timeout: float = 1.0) -> Frame | None:
+        """Block until a frame newer than `last_index` is available; None on timeout/end"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (self._latest is not None and self._latest.index != last_index)
+                or self.finished or self._stop.is_set(),
+                timeout=timeout
+            )
+            latest = self._latest
+            if latest is None or latest.index == last_index:
+                return None
+            self._consumed = True
+            self._cond.notify_all()
+            return latest
+
+    def stats(self) -> dict:
+        return {
+            'source': self.name,
+            'kind': self.kind,
+            'connected': self.connected,
+            'finished': self.finished,
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'read_failures': self.read_failures,
+            'reconnects': self.reconnects,
+            'last_frame_age_ms': int((time.time() - self._latest.timestamp) * 1000) if self._latest else None,
+            'last_error': self.last_error
+        }
+
+
+class VideoCaptureSource(FrameSource):
+    """Any source OpenCV's VideoCapture can open"""
+
+    def __init__(self, target, name: str | None = None, realtime: bool = True):
+        super().__init__(name or str(target), realtime)
+        self.target = target
+        self.cap = None
+
+    def _open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.target)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            return False
+        # Keep OpenCV's own queue as short as possible; the grabber thread already drains it
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return True
+
+    def _grab(self):
+        return self.cap.read()
+
+    def _close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class DeviceSource(VideoCaptureSource):
+    """Local camera by index (e.g. /dev/video0 -> 0)"""
+
+    kind = "device"
+
+    def __init__(self, index: int = 0):
+        super().__init__(index, name=f"device:{index}")
+
+
+class StreamSource(VideoCaptureSource):
+    """RTSP / HTTP network stream"""
+
+    kind = "stream"
+
+
+class VideoFileSource(VideoCaptureSource):
+    """Recorded video file, optionally looped; paced at the file's FPS when realtime=True"""
+
+    kind = "video"
+
+    def __init__(self, path: str, loop: bool = True, realtime: bool = True):
+        super().__init__(path, realtime=realtime)
+        self.loop = loop
+        self.fps = 0.0
+
+    def _open(self) -> bool:
+        if not super()._open():
+            return False
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or DEFAULT_SEQUENCE_FPS
+        return True
+
+    def _frame_interval(self) -> float:
+        return 1.0 / self.fps if self.fps > 0 else 0.0
+
+    def _grab(self):
+        ok, image = self.cap.read()
+        if ok:
+            return ok, image
+        if self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return self.cap.read()
+        self.finished = True
+        return False, None
+
+
+class ImageSequenceSource(FrameSource):
+    """Directory or glob of still images played back at a fixed FPS"""
+
+    kind = "images"
+
+    def __init__(self, pattern: str, fps: float = DEFAULT_SEQUENCE_FPS, loop: bool = True, realtime: bool = True):
+        super().__init__(pattern, realtime)
+        self.pattern = pattern
+        self.fps = fps
+        self.loop = loop
+        self.files: list[str] = []
+        self.position = 0
+
+    def _open(self) -> bool:
+        if os.path.isdir(self.pattern):
+            files = [os.path.join(self.pattern, f) for f in os.listdir(self.pattern)]
+        else:
+            files = glob.glob(self.pattern)
+        self.files = sorted(f for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+        return bool(self.files)
+
+    def _frame_interval(self) -> float:
+        return 1.0 / self.fps if self.fps > 0 else 0.0
+
+    def _grab(self):
+        if self.position >= len(self.files):
+            if not self.loop:
+                self.finished = True
+                return False, None
+            self.position = 0
+        path = self.files[self.position]
+        self.position += 1
+        image = cv2.imread(path)
+        if image is None:
+            self.last_error = f"Cannot read image: {path}"
+            return self._grab() if self.position < len(self.files) else (False, None)
+        return True, image
+
+
+def create_source(spec: str | int, loop: bool = True, realtime: bool = True, fps: float = DEFAULT_SEQUENCE_FPS) -> FrameSource:
+    """Build a frame source from a spec string (device index, URL, video file, directory or glob)"""
+    spec = str(spec).strip()
+    if spec.isdigit():
+        return DeviceSource(int(spec))
+    if spec.lower().startswith(('rtsp://', 'rtmp://', 'http://', 'https://')):
+        return StreamSource(spec)
+    if os.path.isdir(spec) or any(ch in spec for ch in '*?['):
+        return ImageSequenceSource(spec, fps=fps, loop=loop, realtime=realtime)
+    return VideoFileSource(spec, loop=loop, realtime=realtime)
@@ -0,0 +1,101 @@
+"""
+Identity voting engine
+แทน majority count ใน sliding window 5 วินาทีด้วยคะแนนที่ถ่วงน้ำหนักด้วย confidence และลดลงแบบ exponential ตามเวลา
+ตัดสินใจได้ทันทีเมื่อคนที่นำอยู่มี margin เกิน threshold (ไม่ต้องรอให้ครบ window)
+
+State ต่อ session มีแค่ dict ของคะแนนต่อ label (ไม่ต้องเก็บประวัติทุก detection)
+"""
+
+import math
+
+IDENTITY_HALF_LIFE = 0.5       # seconds - คะแนนลดลงครึ่งหนึ่งทุก 0.5 วินาที
+IDENTITY_DECISION_MARGIN = 0.3  # ส่วนต่าง share ระหว่างอันดับ 1 และ 2 ที่ถือว่าตัดสินได้
+IDENTITY_MIN_EVIDENCE = 1.5     # คะแนนขั้นต่ำ (ผลรวม confidence หลัง decay) ก่อนตัดสิน
+PRUNE_WEIGHT = 0.01             # label ที่คะแนนต่ำกว่านี้จะถูกลบออก
+
+
+def check_settings(half_life: float, decision_margin: float, min_evidence: float):
+    """Raise ValueError for settings the voter cannot work with (checked once at startup)"""
+    if not half_life > 0:
+        raise ValueError(f"IDENTITY_HALF_LIFE must be > 0 seconds, got {half_life}")
+    if not 0.0 <= decision_margin <= 1.0:
+        raise ValueError(f"IDENTITY_DECISION_MARGIN must be between 0.0 and 1.0, got {decision_margin}")
+    if not min_evidence >= 0:
+        raise ValueError(f"IDENTITY_MIN_EVIDENCE must be >= 0, got {min_evidence}")
+
+
+class IdentityVoter:
+    """Confidence-weighted, time-decayed votes for one camera session"""
+
+    __slots__ = ('half_life', 'decision_margin', 'min_evidence', 'weights', 'counts', 'last_time', 'decided')
+
+    def __init__(self, half_life: float = IDENTITY_HALF_LIFE, decision_margin: float = IDENTITY_DECISION_MARGIN,
+                 min_evidence: float = IDENTITY_MIN_EVIDENCE):
+        self.half_life = half_life
+        self.decision_margin = decision_margin
+        self.min_evidence = min_evidence
+        self.weights: dict[str, float] = {}  # label -> decayed sum of confidences
+        self.counts: dict[str, float] = {}   # label -> decayed number of detections
+        self.last_time: float | None = None
+        self.decided = ""                    # kept while it leads, "" until the margin is reached
+
+    def _decay(self, now: float):
+        if self.last_time is not None and now > self.last_time and self.weights:
+            factor = math.pow(0.5, (now - self.last_time) / self.half_life)
+            for label in list(self.weights):
+                self.weights[label] *= factor
+                self.counts[label] *= factor
+                if self.weights[label] < PRUNE_WEIGHT:
+                    del self.weights[label]
+                    del self.counts[label]
+        self.last_time = now
+
+    def update(self, detections: list[tuple[str, float]], now: float):
+        """Add one frame's detections as (label, confidence) pairs and refresh the decision"""
+        self._decay(now)
+        for label, conf in detections:
+            self.weights[label] = self.weights.get(label, 0.0) + conf
+            self.counts[label] = self.counts.get(label, 0.0) + 1.0
+
+        ranked = self.ranked()
+        if not ranked or ranked[0][1] < self.min_evidence:
+            # Not enough recent evidence (nobody in view any more)
+            self.decided = ""
+            return
+        leader, lead_weight = ranked[0]
+        total = self.total_weight
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        if (lead_weight - second) / total >= self.decision_margin:
+            self.decided = leader
+        elif self.decided and self.decided != leader:
+            # The decided identity lost the lead: undecided until someone reaches the margin again
+            self.decided = ""
+
+    def ranked(self) -> list[tuple[str, float]]:
+        return sorted(self.weights.items(), key=lambda item: item[1], reverse=True)
+
+    @property
+    def total_weight(self) -> float:
+        return sum(self.weights.values())
+
+    @property
+    def leader(self) -> str:
+        return max(self.weights, key=self.weights.get) if self.weights else ""
+
+    @property
+    def prediction(self) -> str:
+        """Decided identity, or the current leader while still undecided"""
+        return self.decided or self.leader
+
+    def share(self, label: str) -> float:
+        """Percentage of the total (decayed) vote held by `label`"""
+        total = self.total_weight
+        return self.weights.get(label, 0.0) / total * 100 if total > 0 else 0.0
+
+    @property
+    def margin(self) -> float:
+        ranked = self.ranked()
+        if not ranked:
+            return 0.0
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        return (ranked[0][1] - second) / self.total_weight * 100
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the Eye Detection backend
+รัน server จริง (subprocess) พร้อม frame source จำลองและ user store จำลอง
+แล้วเปิด /ws clients หลายตัวพร้อมยิง /users และ /health ไปพร้อมกัน
+
+ใช้ได้บนเครื่อง CPU-only ที่ไม่มี network (ต้องมีไฟล์ weights เช่น last.pt)
+
+Usage:
+    python load_test.py --clients 10 --duration 30
+    python load_test.py --clients 10 --slow-clients 2 --db-latency 0.5 --db-error-rate 0.05
+    python load_test.py --video recorded.mp4 --http-workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
+
+from frame_sources import FrameSource, VideoFileSource
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Return {'p50': ..., 'p95': ..., 'p99': ..., 'max': ...} for a list of numbers"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2) for p in points}
+    result['max'] = round(ordered[-1], 2)
+    return result
+
+
+# ===== Server side: stand-ins injected into main.py =====
+
+class SyntheticSource(FrameSource):
+    """Frame source that renders a moving box at a fixed FPS"""
+
+    kind = "synthetic"
+
+    def __init__(self, fps: float, width: int = 640, height: int = 480):
+        super().__init__("synthetic")
+        self.fps = fps
+        self.width, self.height = width, height
+        self.frame_index = 0
+
+    def _open(self) -> bool:
+        return True
+
+    def _frame_interval(self) -> float:
+        return 1.0 / self.fps if self.fps > 0 else 0.0
+
+    def _grab(self):
+        self.frame_index += 1
+        frame = np.full((self.height, self.width, 3), 40, dtype=np.uint8)
+        x = (self.frame_index * 8) % (self.width - 120)
+        frame[180:300, x:x + 120] = (200, 180, 160)
+        return True, frame
+
+
+def synthetic_source(fps: float, video: str | None = None) -> FrameSource:
+    """Frame source for the server: loop a recorded video, or render synthetic frames"""
+    if video:
+        return VideoFileSource(video, loop=True).start()
+    return SyntheticSource(fps).start()
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Minimal subset of the supabase query builder used by main.py"""
+
+    def __init__(self, store):
+        self.store = store
+        self.action = 'select'
+        self.payload = None
+        self.filters = []
+        self.max_rows = None
+
+    def select(self, *_):
+        return self
+
+    def insert(self, data):
+        self.action, self.payload = 'insert', data
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def ilike(self, column, pattern):
+        self.filters.append(lambda row: str(row.get(column, '')).lower() == pattern.lower())
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def execute(self):
+        self.store.simulate()
+        rows = [row for row in self.store.rows if all(f(row) for f in self.filters)]
+        if self.action == 'insert':
+            row = {'user_id': f"fake-{len(self.store.rows) + 1}", 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), **self.payload}
+            self.store.rows.append(row)
+            return FakeResponse([row])
+        if self.action == 'delete':
+            self.store.rows = [row for row in self.store.rows if row not in rows]
+            return FakeResponse(rows)
+        return FakeResponse(rows[:self.max_rows] if self.max_rows else rows)
+
+
+class FakeUserStore:
+    """Local stand-in for the supabase client with configurable latency and error rate"""
+
+    def __init__(self, labels, latency: float, error_rate: float):
+        self.latency = latency
+        self.error_rate = error_rate
+        # `labels` may be a callable: the model (and its class names) loads after the store is installed
+        self._labels = labels
+        self._rows = None
+
+    @property
+    def rows(self) -> list:
+        if self._rows is None:
+            labels = self._labels() if callable(self._labels) else self._labels
+            if not labels:
+                return []  # model not loaded yet, seed on a later query
+            self._rows = [
+                {
+                    'user_id': f"fake-{i}",
+                    'username': label,
+                    'student_id': str(65000000 + i),
+                    'label': label,
+                    'created_at': '2025-01-01T00:00:00'
+                }
+                for i, label in enumerate(labels)
+            ]
+        return self._rows
+
+    @rows.setter
+    def rows(self, value: list):
+        self._rows = value
+
+    def simulate(self):
+        # supabase client is synchronous, so the delay blocks the caller just like a slow database would
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise Exception("Simulated database error")
+
+    def table(self, name):
+        return FakeQuery(self)
+
+
+def serve(args):
+    """Run main.app with the stand-ins installed (executed in the server subprocess)"""
+    import logging
+    import uvicorn
+
+    os.environ["MODEL_PATH"] = args.model
+    import main
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Installed before startup, so the app's database component keeps it instead of connecting to Supabase
+    main.supabase = FakeUserStore(
+        lambda: list(main.model_manager.active.names.values()) if main.model_manager.active else [],
+        args.db_latency, args.db_error_rate
+    )
+    main.open_camera = lambda: synthetic_source(args.fps, args.video)
+
+    loop_lag = deque(maxlen=100000)
+
+    async def monitor_loop_lag(interval=0.05):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            loop_lag.append((time.perf_counter() - start - interval) * 1000)
+
+    @main.app.on_event("startup")
+    async def start_lag_monitor():
+        asyncio.create_task(monitor_loop_lag())
+
+    @main.app.get("/loadtest/stats")
+    async def loadtest_stats(reset: bool = False):
+        if reset:
+            loop_lag.clear()
+        times = os.times()
+        rss_mb = None
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss_mb = int(line.split()[1]) / 1024
+        except OSError:
+            import resource
+            rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return {
+            'cpu_time': times.user + times.system,
+            'wall_time': time.monotonic(),
+            'rss_mb': round(rss_mb, 1) if rss_mb is not None else None,
+            'loop_lag_ms': percentiles(list(loop_lag))
+        }
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# ===== Client side =====
+
+class ClientResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.messages = 0
+        self.bytes = 0
+        self.latencies = []
+        self.errors = []
+        self.started = None
+        self.finished = None
+
+    @property
+    def fps(self) -> float:
+        if not self.started or not self.finished or self.finished <= self.started:
+            return 0.0
+        return self.messages / (self.finished - self.started)
+
+
+async def ws_client(url: str, result: ClientResult, deadline: float, slow_delay: float):
+    import websockets
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            result.started = time.time()
+            while time.time() < deadline:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=max(0.1, deadline - time.time()))
+                except asyncio.TimeoutError:
+                    break
+                received = time.time()
+                data = json.loads(message)
+                if data.get('error'):
+                    result.errors.append(data['error'])
+                    break
+                result.messages += 1
+                result.bytes += len(message)
+                if 'timestamp' in data:
+                    result.latencies.append((received - data['timestamp']) * 1000)
+                if slow_delay:
+                    await asyncio.sleep(slow_delay)  # simulate a slow dashboard
+    except Exception as e:
+        result.errors.append(str(e))
+    result.finished = time.time()
+
+
+def http_worker(base_url: str, paths: list[str], deadline: float, stats: dict, lock: threading.Lock):
+    session = requests.Session()
+    i = 0
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            status = session.get(f"{base_url}{path}", timeout=10).status_code
+        except requests.RequestException:
+            status = 'error'
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            entry = stats.setdefault(path, {'latencies': [], 'status': {}})
+            entry['latencies'].append(elapsed)
+            entry['status'][str(status)] = entry['status'].get(str(status), 0) + 1
+
+
+async def sample_server(base_url: str, deadline: float, samples: list):
+    while time.time() < deadline:
+        try:
+            response = await asyncio.to_thread(requests.get, f"{base_url}/loadtest/stats", timeout=5)
+            samples.append(response.json())
+        except requests.RequestException:
+            pass
+        await asyncio.sleep(1.0)
+
+
+async def run_load(args, base_url: str, ws_url: str):
+    requests.get(f"{base_url}/loadtest/stats", params={'reset': True}, timeout=5)
+    deadline = time.time() + args.duration
+
+    clients = [ClientResult(f"client-{i + 1}{' (slow)' if i < args.slow_clients else ''}") for i in range(args.clients)]
+    tasks = [
+        ws_client(ws_url, result, deadline, args.slow_delay if i < args.slow_clients else 0)
+        for i, result in enumerate(clients)
+    ]
+
+    http_stats, lock = {}, threading.Lock()
+    workers = [
+        threading.Thread(target=http_worker, args=(base_url, ['/users', '/health'], deadline, http_stats, lock), daemon=True)
+        for _ in range(args.http_workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    server_samples = []
+    await asyncio.gather(*tasks, sample_server(base_url, deadline, server_samples))
+    for worker in workers:
+        worker.join()
+    final = requests.get(f"{base_url}/loadtest/stats", timeout=5).json()
+    return clients, http_stats, server_samples, final
+
+
+def print_report(clients, http_stats, server_samples, final):
+    print(f"\n{'=' * 70}")
+    print("📊 WebSocket clients")
+    print(f"{'=' * 70}")
+    print(f"{'Client':<20} {'Msgs':>6} {'FPS':>7} {'KB/msg':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  Errors")
+    for c in clients:
+        p = percentiles(c.latencies)
+        kb = c.bytes / c.messages / 1024 if c.messages else 0
+        print(f"{c.name:<20} {c.messages:>6} {c.fps:>7.2f} {kb:>8.1f} {p.get('p50', '-'):>8} {p.get('p95', '-'):>8} {p.get('p99', '-'):>8}  {'; '.join(c.errors[:1])}")
+    all_latencies = [lat for c in clients for lat in c.latencies]
+    print(f"\nAll clients latency: {percentiles(all_latencies)}")
+
+    print(f"\n{'=' * 70}")
+    print("🌐 HTTP endpoints")
+    print(f"{'=' * 70}")
+    for path, entry in sorted(http_stats.items()):
+        print(f"{path:<10} requests={len(entry['latencies']):<6} status={entry['status']} latency_ms={percentiles(entry['latencies'])}")
+
+    print(f"\n{'=' * 70}")
+    print("🖥️  Server")
+    print(f"{'=' * 70}")
+    if len(server_samples) >= 2:
+        first, last = server_samples[0], final
+        cpu = (last['cpu_time'] - first['cpu_time']) / (last['wall_time'] - first['wall_time']) * 100
+        print(f"CPU: {cpu:.1f}% (of one core)")
+    rss = [s['rss_mb'] for s in server_samples + [final] if s.get('rss_mb') is not None]
+    if rss:
+        print(f"RSS: {rss[-1]:.1f} MB (peak {max(rss):.1f} MB)")
+    print(f"Event-loop lag (ms): {final['loop_lag_ms']}")
+
+
+def wait_for_server(base_url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server process exited during startup")
+        try:
+            # /ready turns 200 once the model is loaded and warmed up
+            if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eye Detection backend load test")
+    parser.add_argument('mode', nargs='?', default='run', choices=['run', 'serve'], help=argparse.SUPPRESS)
+    parser.add_argument('--clients', type=int, default=10, help="number of concurrent /ws clients")
+    parser.add_argument('--slow-clients', type=int, default=0, help="how many of the clients read slowly")
+    parser.add_argument('--slow-delay', type=float, default=0.5, help="seconds a slow client waits per message")
+    parser.add_argument('--http-workers', type=int, default=4, help="threads hammering /users and /health")
+    parser.add_argument('--duration', type=float, default=30, help="test duration in seconds")
+    parser.add_argument('--fps', type=float, default=30, help="synthetic camera frame rate")
+    parser.add_argument('--video', help="loop this video file instead of synthetic frames")
+    parser.add_argument('--db-latency', type=float, default=0.0, help="seconds added to every user store query")
+    parser.add_argument('--db-error-rate', type=float, default=0.0, help="fraction of user store queries that fail")
+    parser.add_argument('--model', default=os.getenv("MODEL_PATH", "last.pt"), help="YOLO weights file")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        serve(args)
+        return
+
+    if not os.path.isfile(args.model):
+        print(f"❌ Model file not found: {args.model} (use --model)")
+        sys.exit(1)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    ws_url = f"ws://127.0.0.1:{args.port}/ws"
+    server_args = [sys.executable, os.path.abspath(__file__), 'serve'] + [a for a in sys.argv[1:] if a != 'run']
+
+    print("🚀 Starting server with synthetic camera and fake user store...")
+    print(f"   clients={args.clients} slow={args.slow_clients} http_workers={args.http_workers} "
+          f"db_latency={args.db_latency}s db_error_rate={args.db_error_rate} duration={args.duration}s")
+    process = subprocess.Popen(server_args, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        wait_for_server(base_url, process)
+        print("✓ Server ready, running load...")
+        report = asyncio.run(run_load(args, base_url, ws_url))
+        print_report(*report)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Non-blocking logging pipeline
+- QueueHandler: event loop แค่ใส่ record ลง queue (จำกัดขนาด) ส่วนการ format (รวม traceback) และเขียน stderr
+  ทำใน background thread (QueueListener)
+- HotPathLogger: จำกัดจำนวน log ต่อ call site (token bucket) สำหรับ log ที่เกิดทุก frame
+  และไม่สร้าง message เลยถ้า level นั้นถูกปิดอยู่
+- JSON output (LOG_FORMAT=json) พร้อม field เพิ่มเติมเช่น frame_id และ stages
+
+Usage:
+    from log_pipeline import setup_logging, HotPathLogger
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    hot_logger = HotPathLogger(logger)
+    hot_logger.info("Cache hit for label: %s", label)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+HOT_PATH_RATE = 1.0   # messages per second per call site
+HOT_PATH_BURST = 5    # messages allowed in a burst before rate limiting kicks in
+LOG_QUEUE_SIZE = 10000  # records waiting for the writer thread; newer records are dropped when full
+
+# Extra fields copied into JSON output when present on a record (logger.info(..., extra={...}))
+STRUCTURED_FIELDS = ('frame_id', 'stages', 'total_ms', 'suppressed')
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for field in STRUCTURED_FIELDS:
+            if hasattr(record, field):
+                data[field] = getattr(record, field)
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records unformatted so %-args and tracebacks are rendered on the listener thread.
+
+    The stock QueueHandler.prepare() merges the message and traceback on the calling thread (the
+    event loop) and clears exc_info. When the bounded queue is full the record is dropped and the
+    number of dropped records is reported once there is room again.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.dropped:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': "⚠ %d log records dropped (log queue full)", 'args': (self.dropped,)
+                }))
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Blocking put: the queue may be full at shutdown, the writer thread is still draining it
+        self.queue.put(self._sentinel)
+
+
+def setup_logging(level: str | None = None, json_output: bool | None = None):
+    """Route the root logger through a queue; a background thread formats and writes to stderr"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    if json_output is None:
+        json_output = os.getenv("LOG_FORMAT", "text").lower() == "json"
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if json_output else logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.handlers[:] = [DeferredQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = _Listener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated', 'suppressed')
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.suppressed = 0
+
+
+class HotPathLogger:
+    """
+    Rate-limited logger for messages emitted on every frame or lookup.
+
+    Each call site (file + line) gets its own token bucket. Dropped messages are counted and
+    reported with the next message that gets through. Use %-style args so nothing is
+    formatted unless the record is actually emitted.
+    """
+
+    def __init__(self, logger: logging.Logger, rate: float = HOT_PATH_RATE, burst: float = HOT_PATH_BURST):
+        self.logger = logger
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[tuple, _Bucket] = {}
+
+    def _log(self, level: int, msg: str, args, kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        caller = sys._getframe(2)
+        key = (caller.f_code, caller.f_lineno)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst)
+
+        now = time.monotonic()
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        if bucket.tokens < 1:
+            bucket.suppressed += 1
+            return
+        bucket.tokens -= 1
+
+        if bucket.suppressed:
+            msg = f"{msg} (+%d similar suppressed)"
+            args = (*args, bucket.suppressed)
+            kwargs.setdefault('extra', {})['suppressed'] = bucket.suppressed
+            bucket.suppressed = 0
+        self.logger.log(level, msg, *args, stacklevel=3, **kwargs)
+
+    def debug(self, msg: str, *args, **kwargs):
+        self._log(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg: str, *args, **kwargs):
+        self._log(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg: str, *args, **kwargs):
+        self._log(logging.WARNING, msg, args, kwargs)
+
+    def error(self, msg: str, *args, **kwargs):
+        self._log(logging.ERROR, msg, args, kwargs)
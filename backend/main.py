@@ -1,62 +1,126 @@
-import cv2
-from ultralytics import YOLO
 from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import asyncio
-import base64
 import json
 import time
-from collections import deque, Counter
-import torch
-from supabase import create_client, Client
+import random
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import logging
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+from log_pipeline import setup_logging, HotPathLogger
+from model_manager import ModelManager, get_device
+from identity import IdentityVoter, check_settings, IDENTITY_HALF_LIFE, IDENTITY_DECISION_MARGIN, IDENTITY_MIN_EVIDENCE
+from readiness import Readiness, DISABLED, READY
+from profiler import MAX_PROFILE_DURATION, SlowFrameLog, sample_stacks, summarize, to_folded
+from streaming import FrameHub, EncodedFrame, StreamClosed, CompactSession, MJPEG_BOUNDARY, MESSAGE_FORMATS, msgpack
 
 load_dotenv()
 
+# Configure logging: records are queued and written by a background thread (LOG_LEVEL, LOG_FORMAT=text|json)
+setup_logging()
+logger = logging.getLogger(__name__)
+hot_logger = HotPathLogger(logger)  # rate-limited per call site, for messages logged every frame
+
 app = FastAPI()
 
-# Initialize Supabase client
-try:
+# Heavy modules (torch, ultralytics, cv2, supabase) and the model are loaded by a background
+# startup task, so the HTTP app (and /health, /ready) is served immediately. See load_components().
+readiness = Readiness()
+readiness.register("imports")                   # torch, ultralytics, cv2
+readiness.register("model")                     # YOLO weights + warm-up inference
+readiness.register("database", required=False)  # Supabase client (optional)
+MODEL_READY_TIMEOUT = float(os.getenv("MODEL_READY_TIMEOUT", "30"))  # seconds a stream request waits for the model
+
+startup_task = None
+supabase = None  # Supabase client, created by init_database() (load_test.py may pre-set a stand-in)
+
+# Model configuration
+CONFIDENCE_THRESHOLD = 0.25  # Confidence threshold for detection (can be modified)
+
+MODEL_PATH = os.getenv("MODEL_PATH", "last.pt")
+# POST /models/load only accepts weights inside this directory (default: the startup model's directory)
+MODEL_DIR = os.getenv("MODEL_DIR") or os.path.dirname(os.path.abspath(MODEL_PATH))
+
+model_manager = ModelManager(MODEL_DIR)
+
+# Frame source: device index ("0"), RTSP/HTTP URL, video file, or image directory/glob
+CAMERA_SOURCE = os.getenv("CAMERA_SOURCE", "0")
+SOURCE_LOOP = os.getenv("SOURCE_LOOP", "true").lower() == "true"          # loop video files / image sequences
+SOURCE_REALTIME = os.getenv("SOURCE_REALTIME", "true").lower() == "true"  # false = process every frame of a file
+FIRST_FRAME_TIMEOUT = 10  # seconds to wait for the source to deliver its first frame
+
+source = None
+
+# Shared output buffer: detection loop runs once, every /ws, /stream.mjpg and /events client reads from it
+frame_hub = FrameHub()
+detection_task = None
+
+# Identity voting: confidence-weighted votes with exponential time decay (ดู identity.py)
+IDENTITY_HALF_LIFE = float(os.getenv("IDENTITY_HALF_LIFE", IDENTITY_HALF_LIFE))                  # seconds
+IDENTITY_DECISION_MARGIN = float(os.getenv("IDENTITY_DECISION_MARGIN", IDENTITY_DECISION_MARGIN))  # 0.0 - 1.0
+IDENTITY_MIN_EVIDENCE = float(os.getenv("IDENTITY_MIN_EVIDENCE", IDENTITY_MIN_EVIDENCE))          # sum of confidences
+check_settings(IDENTITY_HALF_LIFE, IDENTITY_DECISION_MARGIN, IDENTITY_MIN_EVIDENCE)  # fail at startup, not in the loop
+
+# Profiling (ปิดอยู่โดย default, ไม่มี overhead)
+slow_frames = SlowFrameLog()
+profile_running = False
+
+def init_database():
+    """Create the Supabase client (runs in a worker thread during startup)"""
+    global supabase
+    if supabase is not None:
+        return  # already provided (e.g. a stand-in store)
+    
     SUPABASE_URL = os.getenv("SUPABASE_URL")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-    
     if not SUPABASE_URL or not SUPABASE_KEY:
         logger.warning("Supabase credentials not found. Database features will be disabled.")
-        supabase: Client = None
-    else:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        logger.info("Supabase client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize Supabase client: {e}")
-    supabase = None
+        return DISABLED
+    
+    from supabase import create_client
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    logger.info("Supabase client initialized successfully")
 
-# Model configuration
-CONFIDENCE_THRESHOLD = 0.25  # Confidence threshold for detection (can be modified)
+def import_heavy_modules():
+    """Import the vision stack once so later lazy imports are just a dict lookup"""
+    import cv2  # noqa: F401
+    import torch  # noqa: F401
+    import ultralytics  # noqa: F401
+
+async def load_components():
+    """Background startup: database and vision stack in parallel, then the model (load + warm-up)"""
+    async def load_vision():
+        if await readiness.run("imports", import_heavy_modules) == READY:
+            await readiness.run("model", model_manager.load_initial, MODEL_PATH)
+        else:
+            readiness.fail("model", "Heavy imports failed")
+    
+    await asyncio.gather(load_vision(), readiness.run("database", init_database))
+    if readiness.ready:
+        logger.info("🚀 Service ready in %d ms (Confidence threshold: %s)", readiness.to_dict()['uptime_ms'], CONFIDENCE_THRESHOLD)
 
-try:
-    model = YOLO('last.pt')
-    logger.info(f"YOLO model loaded successfully (Confidence threshold: {CONFIDENCE_THRESHOLD})")
-except Exception as e:
-    logger.error(f"Failed to load YOLO model: {e}")
-    raise
+@app.on_event("startup")
+async def start_background_loading():
+    global startup_task
+    logger.info("HTTP app started, loading components in background")
+    startup_task = asyncio.create_task(load_components())  # keep a reference so the task isn't garbage collected
 
-cap = None
+def model_unavailable_reason() -> str:
+    error = readiness.failure("model")
+    return f"Model failed to load: {error}" if error else "Model is still loading, try again shortly"
 
-history = deque()
-HISTORY_WINDOW = 5  # seconds - เก็บ log 5 วินาทีล่าสุด
+async def wait_for_model() -> str | None:
+    """Wait (up to MODEL_READY_TIMEOUT) for the model; returns an error message if it is not ready"""
+    if await readiness.wait("model", MODEL_READY_TIMEOUT):
+        return None
+    return model_unavailable_reason()
 
-predicted = ""
-predicted_percentage = 0.0
+def require_model_ready():
+    """Reject model management until the startup model is installed, so it can't overwrite a hot-loaded one"""
+    if not readiness.is_ready("model"):
+        raise HTTPException(status_code=503, detail=model_unavailable_reason())
 
 # User cache with timestamp
 user_cache = {}
@@ -68,6 +132,10 @@ class UserCreate(BaseModel):
     student_id: str
     label: str
 
+class ModelLoadRequest(BaseModel):
+    path: str
+    target: str = "active"  # "active" = swap in after warm-up, "candidate" = load for A/B
+
 class UserResponse(BaseModel):
     user_id: str
     username: str
@@ -78,35 +146,35 @@ class UserResponse(BaseModel):
 async def get_user_by_label(label: str):
     """Query user from database by label with flexible matching (full label, name, or student_id)"""
     if not supabase:
-        logger.error(f"❌ Supabase client not initialized! Cannot query user for label: {label}")
+        hot_logger.error("❌ Supabase client not initialized! Cannot query user for label: %s", label)
         return None
     
     # Check cache first
     if label in user_cache:
         cached_time, user_data = user_cache[label]
         if datetime.now() - cached_time < timedelta(seconds=CACHE_TIMEOUT):
-            logger.info(f"✓ Cache hit for label: {label} -> {user_data.get('username', 'N/A') if user_data else 'None'}")
+            hot_logger.info("✓ Cache hit for label: %s -> %s", label, user_data.get('username', 'N/A') if user_data else 'None')
             return user_data
         else:
-            logger.debug(f"⌛ Cache expired for label: {label}")
+            logger.debug("⌛ Cache expired for label: %s", label)
     
     # Query from database with multiple strategies
     try:
-        logger.info(f"🔍 Querying database for label: {label}")
+        hot_logger.info("🔍 Querying database for label: %s", label)
         
         # Strategy 1: Try exact match first
         response = supabase.table('users').select('*').eq('label', label).execute()
         if response.data and len(response.data) > 0:
             user_data = response.data[0]
             user_cache[label] = (datetime.now(), user_data)
-            logger.info(f"✓ Exact match found: {label} -> {user_data['username']} (ID: {user_data['student_id']})")
+            logger.info("✓ Exact match found: %s -> %s (ID: %s)", label, user_data['username'], user_data['student_id'])
             return user_data
         
         # Strategy 2: Split label and try matching individual parts
         # Split by space to get parts like "Poom" and "65025367"
         parts = label.strip().split()
         if len(parts) > 1:
-            logger.info(f"🔎 No exact match. Trying individual parts: {parts}")
+            logger.info("🔎 No exact match. Trying individual parts: %s", parts)
             
             # Try each part as label, username, or student_id
             for part in parts:
@@ -115,7 +183,7 @@ async def get_user_by_label(label: str):
                 if response.data and len(response.data) > 0:
                     user_data = response.data[0]
                     user_cache[label] = (datetime.now(), user_data)
-                    logger.info(f"✓ Match found by label part '{part}': {user_data['username']} (ID: {user_data['student_id']})")
+                    logger.info("✓ Match found by label part '%s': %s (ID: %s)", part, user_data['username'], user_data['student_id'])
                     return user_data
                 
                 # Try as username
@@ -123,7 +191,7 @@ async def get_user_by_label(label: str):
                 if response.data and len(response.data) > 0:
                     user_data = response.data[0]
                     user_cache[label] = (datetime.now(), user_data)
-                    logger.info(f"✓ Match found by username '{part}': {user_data['username']} (ID: {user_data['student_id']})")
+                    logger.info("✓ Match found by username '%s': %s (ID: %s)", part, user_data['username'], user_data['student_id'])
                     return user_data
                 
                 # Try as student_id
@@ -131,15 +199,15 @@ async def get_user_by_label(label: str):
                 if response.data and len(response.data) > 0:
                     user_data = response.data[0]
                     user_cache[label] = (datetime.now(), user_data)
-                    logger.info(f"✓ Match found by student_id '{part}': {user_data['username']} (ID: {user_data['student_id']})")
+                    logger.info("✓ Match found by student_id '%s': %s (ID: %s)", part, user_data['username'], user_data['student_id'])
                     return user_data
         
-        logger.warning(f"⚠ No user found for label: '{label}' or its parts in database")
+        logger.warning("⚠ No user found for label: '%s' or its parts in database", label)
         # Cache negative result to avoid repeated queries
         user_cache[label] = (datetime.now(), None)
         return None
     except Exception as e:
-        logger.error(f"❌ Database query error for label {label}: {e}")
+        hot_logger.error("❌ Database query error for label %s: %s", label, e)
         return None
 
 async def get_users_by_labels_batch(labels: list[str]) -> dict:
@@ -156,7 +224,7 @@ async def get_users_by_labels_batch(labels: list[str]) -> dict:
             cached_time, user_data = user_cache[label]
             if datetime.now() - cached_time < timedelta(seconds=CACHE_TIMEOUT):
                 result[label] = user_data
-                logger.debug(f"✓ Cache hit for label: {label}")
+                hot_logger.debug("✓ Cache hit for label: %s", label)
             else:
                 uncached_labels.append(label)
         else:
@@ -165,7 +233,7 @@ async def get_users_by_labels_batch(labels: list[str]) -> dict:
     # Batch query for uncached labels
     if uncached_labels:
         try:
-            logger.info(f"🔍 Batch querying {len(uncached_labels)} labels: {uncached_labels}")
+            hot_logger.info("🔍 Batch querying %d labels: %s", len(uncached_labels), uncached_labels)
             
             # Try exact match first
             response = supabase.table('users').select('*').in_('label', uncached_labels).execute()
@@ -179,7 +247,7 @@ async def get_users_by_labels_batch(labels: list[str]) -> dict:
                     if label == orig_label or label in orig_label.split():
                         result[orig_label] = user_data
                         user_cache[orig_label] = (now, user_data)
-                        logger.info(f"✓ User found: {orig_label} -> {user_data['username']}")
+                        logger.info("✓ User found: %s -> %s", orig_label, user_data['username'])
             
             # For labels not found, try flexible matching
             found_labels = set(result.keys())
@@ -192,43 +260,100 @@ async def get_users_by_labels_batch(labels: list[str]) -> dict:
                 # Cache is already updated in get_user_by_label
                     
         except Exception as e:
-            logger.error(f"❌ Batch query error: {e}")
+            hot_logger.error("❌ Batch query error: %s", e)
             # Return partial results on error
     
     return result
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    global cap
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        await websocket.send_text(json.dumps({'error': 'Cannot open camera'}))
-        await websocket.close()
+def ensure_detection_loop():
+    """Start the shared detection loop if it is not already running"""
+    global detection_task
+    if detection_task is None or detection_task.done():
+        frame_hub.reset()
+        detection_task = asyncio.create_task(detection_loop())
+        detection_task.add_done_callback(on_detection_loop_done)
+
+def on_detection_loop_done(task: asyncio.Task):
+    """Make sure consumers are released and the camera is closed if the loop crashed"""
+    if task.cancelled():
+        return
+    if task.exception() is None:
+        # A client that connected while the source was stopping found the loop still running
+        # (ensure_detection_loop was a no-op) and is now waiting for frames: start a new loop
+        if frame_hub.subscribers > 0 and not frame_hub.error:
+            ensure_detection_loop()
+        return
+    logger.error("❌ Detection loop crashed: %s", task.exception(), exc_info=task.exception())
+    frame_hub.close(f"Detection error: {task.exception()}")
+    if source:
+        source.stop(wait=False)
+
+def open_camera():
+    """Create and start the frame source used by the detection loop (replaced by load_test.py)"""
+    from frame_sources import create_source
+    return create_source(CAMERA_SOURCE, loop=SOURCE_LOOP, realtime=SOURCE_REALTIME).start()
+
+async def detection_loop():
+    """Capture, detect and publish frames to frame_hub while anyone is subscribed"""
+    global source
+    source = open_camera()
+    # Grabber thread opens the source in the background; wait (off the event loop) for the first frame
+    captured = await asyncio.to_thread(source.wait_frame, None, FIRST_FRAME_TIMEOUT)
+    if captured is None:
+        frame_hub.close('Cannot open camera')
+        await asyncio.to_thread(source.stop)
         return
+    logger.info("Detection loop started (%s)", source.name)
     prev_time = time.time()
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    session_roll = random.random()  # ใช้ตัดสินว่า session นี้ไปที่ candidate หรือไม่ (routing mode = session)
+    identity = IdentityVoter(IDENTITY_HALF_LIFE, IDENTITY_DECISION_MARGIN, IDENTITY_MIN_EVIDENCE)
+    while frame_hub.subscribers > 0:
+        if captured is None:
+            # Always take the newest frame; older ones were already dropped by the grabber thread
+            captured = await asyncio.to_thread(source.wait_frame, last_index, 1.0)
+            if captured is None:
+                if source.finished:
+                    frame_hub.close('Video source ended')
+                    break
+                continue  # source is reconnecting, keep consumers connected
+        frame = captured.image
+        last_index = captured.index
+        capture_time = captured.timestamp
+        captured = None
+        timer = slow_frames.timer()  # None unless slow-frame logging is enabled
+        device = get_device()
+        # Resolve the model once per frame so a hot swap only takes effect between frames
+        serving, reference = model_manager.route(session_roll)
+        model_names = serving.names
         start_time = time.time()
-        device = 0 if torch.cuda.is_available() else 'cpu'
         # Run inference with confidence threshold
-        results = model(
+        results = serving.model(
             frame, 
             device=device, 
             verbose=False,
             conf=CONFIDENCE_THRESHOLD  # Use configurable confidence threshold
         )
         latency = int((time.time() - start_time) * 1000)
+        if timer:
+            timer.mark('inference')
+        if reference is not None:
+            # A/B: frame นี้ไปที่ candidate -> รัน active model ด้วยเพื่อเทียบ latency และ label
+            ref_start = time.time()
+            ref_results = reference.model(frame, device=device, verbose=False, conf=CONFIDENCE_THRESHOLD)
+            ref_latency = int((time.time() - ref_start) * 1000)
+            model_manager.comparison.record(
+                {reference.names[int(c)] for c in ref_results[0].boxes.cls.tolist()}, ref_latency,
+                {model_names[int(c)] for c in results[0].boxes.cls.tolist()}, latency
+            )
+            if timer:
+                timer.mark('ab_reference')
         # Plot with labels only (no confidence scores)
         annotated_frame = results[0].plot(
             conf=False,  # ซ่อน confidence score
             labels=True  # แสดงเฉพาะ label
         )
-        # Optimize JPEG encoding: quality 70 reduces size by ~40% with minimal visual loss
-        _, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-        frame_b64 = base64.b64encode(buffer).decode('utf-8')
+        if timer:
+            timer.mark('plot')
         detections = []
         for box in results[0].boxes:
             detections.append({
@@ -239,95 +364,167 @@ async def websocket_endpoint(websocket: WebSocket):
                 'conf': box.conf[0].item(),
                 'cls': box.cls[0].item()
             })
-        current_time = time.time()
-        # clean old detections (เก็บแค่ 5 วินาทีล่าสุด)
-        while history and history[0][0] < current_time - HISTORY_WINDOW:
-            history.popleft()
-        # add current detections
-        for d in detections:
-            history.append((current_time, int(d['cls'])))
+        # อัปเดตคะแนนของแต่ละคน (ถ่วงด้วย confidence และลดลงตามเวลา)
+        identity.update([(model_names[int(d['cls'])], d['conf']) for d in detections], capture_time)
         
-        # predict most common with percentage
         user_info = None
         prediction_stats = {}  # เก็บสถิติแต่ละคนพร้อม user info
+        predicted = identity.prediction
         
         try:
-            if history:
-                # นับจำนวนแต่ละ class
-                cls_counts = Counter(cls for _, cls in history)
-                total_detections = len(history)
-                
-                # Get all unique labels
-                all_labels = [model.names[cls] for cls in cls_counts.keys()]
-                
+            if identity.weights:
                 # BATCH QUERY: Query all users at once instead of one-by-one (90% faster!)
-                logger.debug(f"📊 Processing {len(cls_counts)} detected people")
-                users_dict = await get_users_by_labels_batch(all_labels)
+                users_dict = await get_users_by_labels_batch(list(identity.weights))
                 
-                # คำนวณเปอร์เซ็นต์แต่ละคนและใช้ผลจาก batch query
-                for cls, count in cls_counts.items():
-                    label = model.names[cls]
-                    percentage = (count / total_detections) * 100
-                    label_user_info = users_dict.get(label)
-                    
+                for label, _ in identity.ranked():
                     prediction_stats[label] = {
-                        'count': count,
-                        'percentage': round(percentage, 2),
-                        'user': label_user_info  # เพิ่ม user info ของแต่ละคน
+                        'count': round(identity.counts[label], 1),
+                        'percentage': round(identity.share(label), 2),
+                        'user': users_dict.get(label)  # เพิ่ม user info ของแต่ละคน
                     }
-                    
-                    if label_user_info:
-                        logger.debug(f"✓ Added user info for {label}: {label_user_info['username']}")
-                    else:
-                        logger.debug(f"⚠ No user info for label: {label}")
-                
-                # หาคนที่มีเปอร์เซ็นต์สูงสุด
-                most_common_cls, most_common_count = cls_counts.most_common(1)[0]
-                predicted = model.names[most_common_cls]
-                predicted_percentage = (most_common_count / total_detections) * 100
                 
                 # Get user info for top prediction from stats
-                user_info = prediction_stats[predicted].get('user')
-                
-                logger.debug(f"Prediction: {predicted} ({predicted_percentage:.2f}%) | Stats: {prediction_stats}")
-            else:
-                predicted = ""
-                predicted_percentage = 0.0
-                prediction_stats = {}
+                user_info = prediction_stats[predicted].get('user') if predicted in prediction_stats else None
         except Exception as e:
-            logger.error(f"Error in prediction/user lookup: {e}")
-            predicted = ""
-            predicted_percentage = 0.0
+            hot_logger.error("Error in prediction/user lookup: %s", e)
             prediction_stats = {}
             user_info = None
+        if timer:
+            timer.mark('prediction_lookup')
 
         current_time = time.time()
         fps = 1 / (current_time - prev_time) if current_time - prev_time > 0 else 0
         prev_time = current_time
-        detection_texts = [f"{model.names[int(d['cls'])]}: {d['conf']:.2f}" for d in detections]
+        detection_texts = [f"{model_names[int(d['cls'])]}: {d['conf']:.2f}" for d in detections]
         log = f"Detected: {', '.join(detection_texts)} at {time.strftime('%H:%M:%S')}" if detections else ""
         data = {
-            'frame': frame_b64,
             'detections': detections,
             'fps': round(fps, 2),
             'latency': latency,
             'log': log,
             'predicted': predicted,
-            'predicted_percentage': round(predicted_percentage, 2),
+            'predicted_percentage': round(identity.share(predicted), 2),
+            'decided': bool(identity.decided),  # True once the leader's margin passed the threshold
+            'margin': round(identity.margin, 2),
             'prediction_stats': prediction_stats,
-            'history_size': len(history),
-            'user': user_info  # Add user information from database
+            'history_size': round(sum(identity.counts.values()), 1),
+            'user': user_info,  # Add user information from database
+            'timestamp': round(capture_time, 3)  # when the frame was captured (server clock)
         }
-        try:
-            await websocket.send_text(json.dumps(data))
-            await asyncio.sleep(0.03)
-        except Exception as e:
-            logger.error(f"WebSocket error: {e}")
-            break
+        # JPEG/base64/JSON are encoded lazily, once per frame, by whichever output needs them first
+        encoded = EncodedFrame(frame_hub.next_id(), annotated_frame, data)
+        if timer:
+            timer.mark('build_message')
+            # Every output needs the JPEG, so encode it here (consumers reuse the cached result).
+            # Message serialization depends on the protocol each client uses and is not timed here
+            encoded.jpeg
+            timer.mark('jpeg')
+        frame_hub.publish(encoded)
+        if timer:
+            slow_frames.check(timer, encoded.frame_id)
     
-    if cap:
-        cap.release()
-        logger.info("Camera released")
+    # Drop the last frame so a client connecting during shutdown doesn't get a stale one
+    frame_hub.latest = None
+    await asyncio.to_thread(source.stop)
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, protocol: str = "full", format: str = "json"):
+    """
+    protocol=full   -> every message is the complete JSON frame (default)
+    protocol=delta  -> compact protocol: users sent once and referenced by ID, only changed fields
+                       per message, periodic keyframes; format=json or format=msgpack (binary)
+    """
+    await websocket.accept()
+    if protocol not in ("full", "delta") or format not in MESSAGE_FORMATS:
+        await websocket.send_text(json.dumps({'error': f"Unsupported protocol/format: {protocol}/{format}"}))
+        await websocket.close()
+        return
+    if format == "msgpack" and msgpack is None:
+        await websocket.send_text(json.dumps({'error': "msgpack is not installed on the server"}))
+        await websocket.close()
+        return
+    
+    error = await wait_for_model()
+    if error:
+        await websocket.send_text(json.dumps({'error': error}))
+        await websocket.close()
+        return
+    
+    session = CompactSession(format) if protocol == "delta" else None
+    with frame_hub.subscribe():
+        ensure_detection_loop()
+        last_id = None
+        while True:
+            try:
+                encoded = await frame_hub.next_frame(last_id)
+            except StreamClosed as e:
+                await websocket.send_text(json.dumps({'error': str(e)}))
+                await websocket.close()
+                break
+            last_id = encoded.frame_id
+            try:
+                if session is None:
+                    await websocket.send_text(encoded.ws_message())
+                    continue
+                for message in session.messages(encoded):
+                    if isinstance(message, bytes):
+                        await websocket.send_bytes(message)
+                    else:
+                        await websocket.send_text(message)
+            except Exception as e:
+                logger.error(f"WebSocket error: {e}")
+                break
+
+@app.get("/stream.mjpg")
+async def mjpeg_stream():
+    """MJPEG stream (multipart/x-mixed-replace) for <img> tags and NVR tools"""
+    error = await wait_for_model()
+    if error:
+        raise HTTPException(status_code=503, detail=error)
+    
+    async def generate():
+        with frame_hub.subscribe():
+            ensure_detection_loop()
+            last_id = None
+            while True:
+                try:
+                    encoded = await frame_hub.next_frame(last_id)
+                except StreamClosed:
+                    break
+                last_id = encoded.frame_id
+                yield encoded.mjpeg_part()
+
+    return StreamingResponse(
+        generate(),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.get("/events")
+async def prediction_events():
+    """Server-Sent Events stream of prediction/stat metadata (no frames)"""
+    error = await wait_for_model()
+    if error:
+        raise HTTPException(status_code=503, detail=error)
+    
+    async def generate():
+        with frame_hub.subscribe():
+            ensure_detection_loop()
+            last_id = None
+            while True:
+                try:
+                    encoded = await frame_hub.next_frame(last_id)
+                except StreamClosed as e:
+                    yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+                    break
+                last_id = encoded.frame_id
+                yield encoded.sse_event()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # API Endpoints for User Management
 @app.get("/users")
@@ -419,12 +616,21 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
+        "ready": readiness.ready,
         "database": "connected" if supabase else "disconnected",
         "cache_size": len(user_cache),
-        "model_loaded": model is not None,
+        "camera": source.stats() if source else None,
+        "model_loaded": model_manager.active is not None,
+        "model_path": model_manager.active.path if model_manager.active else None,
         "confidence_threshold": CONFIDENCE_THRESHOLD
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once required components (imports, model) are loaded, 503 before that"""
+    data = readiness.to_dict()
+    return JSONResponse(status_code=200 if data['ready'] else 503, content=data)
+
 @app.get("/config/confidence")
 async def get_confidence():
     """Get current confidence threshold"""
@@ -453,6 +659,132 @@ async def set_confidence(confidence: float):
         "message": f"Confidence threshold updated to {CONFIDENCE_THRESHOLD}"
     }
 
+# API Endpoints for Model Management
+@app.get("/models")
+async def get_models():
+    """Get active, previous and candidate models with A/B comparison stats"""
+    return {"success": True, "data": model_manager.to_dict()}
+
+@app.post("/models/load")
+async def load_model(request: ModelLoadRequest):
+    """Load new weights in the background, warm them up and swap them in (or load as candidate)"""
+    require_model_ready()
+    if request.target not in ("active", "candidate"):
+        raise HTTPException(status_code=400, detail="Target must be 'active' or 'candidate'")
+    if model_manager.is_loading:
+        raise HTTPException(status_code=409, detail=f"Already loading: {model_manager.loading_path}")
+    
+    try:
+        model_manager.start_load(request.path, request.target)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model file not found: {request.path}")
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    
+    logger.info("Loading model in background: %s (target: %s)", request.path, request.target)
+    return {
+        "success": True,
+        "message": f"Loading {request.path} as {request.target}. Check GET /models for progress."
+    }
+
+@app.post("/models/rollback")
+async def rollback_model():
+    """Swap back to the previous model"""
+    require_model_ready()
+    try:
+        model_manager.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "active": model_manager.active.path}
+
+@app.post("/models/candidate/promote")
+async def promote_candidate():
+    """Make the candidate model the active one"""
+    require_model_ready()
+    try:
+        model_manager.promote_candidate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "active": model_manager.active.path}
+
+@app.delete("/models/candidate")
+async def discard_candidate():
+    """Unload the candidate model and stop routing frames to it"""
+    require_model_ready()
+    try:
+        model_manager.discard_candidate()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "message": "Candidate model discarded"}
+
+@app.post("/models/candidate/routing")
+async def set_candidate_routing(share: float, mode: str = "frame"):
+    """
+    Route a share of frames (mode=frame) or camera sessions (mode=session) to the candidate.
+
+    All viewers share one detection loop, so in session mode the whole camera session (every
+    connected viewer) goes to one model; the roll is redrawn when the loop restarts.
+    """
+    require_model_ready()
+    if model_manager.candidate is None:
+        raise HTTPException(status_code=400, detail="No candidate model loaded")
+    try:
+        model_manager.set_routing(share, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "routing": {"share": share, "mode": mode}}
+
+# Admin Endpoints for Profiling
+@app.get("/admin/profile")
+async def profile_server(duration: float = 10.0, interval_ms: float = 5.0, format: str = "summary", top: int = 20,
+                         include_idle: bool = False):
+    """
+    Sample all thread stacks of the live server for `duration` seconds (format: summary | folded).
+
+    The summary leaves out threads that were idle (waiting on a lock, queue or select) unless
+    include_idle is set; the folded output always contains every sample.
+    """
+    global profile_running
+    
+    if not 0 < duration <= MAX_PROFILE_DURATION:
+        raise HTTPException(status_code=400, detail=f"Duration must be between 0 and {MAX_PROFILE_DURATION} seconds")
+    if not 1.0 <= interval_ms <= 1000.0:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    if format not in ("summary", "folded"):
+        raise HTTPException(status_code=400, detail="Format must be 'summary' or 'folded'")
+    if profile_running:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    profile_running = True
+    logger.info("🔬 Profiling for %ss (interval %sms)", duration, interval_ms)
+    try:
+        # Sampler runs in a worker thread so the event loop (and the stream) keeps running normally
+        stacks, rounds = await asyncio.to_thread(sample_stacks, duration, interval_ms / 1000)
+    finally:
+        profile_running = False
+    
+    if format == "folded":
+        return PlainTextResponse(
+            to_folded(stacks),
+            headers={"Content-Disposition": f"attachment; filename=profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"}
+        )
+    return {"success": True, "duration": duration, "data": summarize(stacks, rounds, top, include_idle)}
+
+@app.get("/admin/slow-frames")
+async def get_slow_frames():
+    """Get slow-frame logging settings and the most recent slow frames"""
+    return {"success": True, "data": slow_frames.to_dict()}
+
+@app.post("/admin/slow-frames")
+async def set_slow_frames(threshold_ms: float):
+    """Log frame-loop iterations slower than threshold_ms with a per-stage breakdown (0 = disable)"""
+    if threshold_ms < 0:
+        raise HTTPException(status_code=400, detail="threshold_ms must be >= 0")
+    
+    slow_frames.configure(threshold_ms)
+    logger.info(f"Slow-frame logging {'enabled: > ' + str(threshold_ms) + 'ms' if threshold_ms > 0 else 'disabled'}")
+    return {"success": True, "data": slow_frames.to_dict()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+Model management for the detection loop
+โหลด weights ใหม่แบบ background, warm-up แล้วสลับเข้าใช้งานระหว่าง frame
+โดยไม่ต้อง restart server (WebSocket clients ไม่หลุด)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+
+# torch / ultralytics are imported lazily: importing them takes seconds and must not block app startup
+logger = logging.getLogger(__name__)
+
+WARMUP_IMAGE_SIZE = 640  # ขนาดภาพ dummy สำหรับ warm-up inference
+COMPARISON_WINDOW = 500  # จำนวน frame ล่าสุดที่ใช้คำนวณ latency/agreement ของ A/B
+
+
+_device = None
+
+
+def get_device():
+    """Return the inference device (GPU 0 when available, otherwise CPU)"""
+    global _device
+    if _device is None:
+        import torch
+        _device = 0 if torch.cuda.is_available() else 'cpu'
+    return _device
+
+
+class LoadedModel:
+    """A YOLO model together with where it came from and how long it took to load"""
+
+    def __init__(self, model, path: str, load_ms: int, warmup_ms: int):
+        self.model = model
+        self.path = path
+        self.load_ms = load_ms
+        self.warmup_ms = warmup_ms
+        self.loaded_at = time.time()
+
+    @property
+    def names(self) -> dict:
+        return self.model.names
+
+    def to_dict(self) -> dict:
+        return {
+            'path': self.path,
+            'classes': len(self.model.names),
+            'load_ms': self.load_ms,
+            'warmup_ms': self.warmup_ms,
+            'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded_at))
+        }
+
+
+def load_model(path: str) -> LoadedModel:
+    """Load weights from disk and run one warm-up inference (blocking)"""
+    import numpy as np
+    from ultralytics import YOLO
+
+    start = time.time()
+    model = YOLO(path)
+    load_ms = int((time.time() - start) * 1000)
+
+    # Warm-up: first inference pays CUDA/kernel init cost, do it before serving frames
+    start = time.time()
+    dummy = np.zeros((WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE, 3), dtype=np.uint8)
+    model(dummy, device=get_device(), verbose=False)
+    warmup_ms = int((time.time() - start) * 1000)
+
+    return LoadedModel(model, path, load_ms, warmup_ms)
+
+
+class ComparisonStats:
+    """Side-by-side latency and label agreement between active and candidate models"""
+
+    def __init__(self, window: int = COMPARISON_WINDOW):
+        self.samples = deque(maxlen=window)  # (active_ms, candidate_ms, agreed)
+        self.total_frames = 0
+
+    def record(self, active_labels: set, active_ms: int, candidate_labels: set, candidate_ms: int):
+        self.samples.append((active_ms, candidate_ms, active_labels == candidate_labels))
+        self.total_frames += 1
+
+    def reset(self):
+        self.samples.clear()
+        self.total_frames = 0
+
+    def to_dict(self) -> dict:
+        if not self.samples:
+            return {'frames': self.total_frames, 'window': 0}
+        n = len(self.samples)
+        active_ms = sorted(s[0] for s in self.samples)
+        candidate_ms = sorted(s[1] for s in self.samples)
+        agreed = sum(1 for s in self.samples if s[2])
+        return {
+            'frames': self.total_frames,
+            'window': n,
+            'active_latency_ms': {'mean': round(sum(active_ms) / n, 2), 'p50': active_ms[n // 2]},
+            'candidate_latency_ms': {'mean': round(sum(candidate_ms) / n, 2), 'p50': candidate_ms[n // 2]},
+            'label_agreement': round(agreed / n * 100, 2)
+        }
+
+
+class ModelManager:
+    """
+    Holds the active model, the previous one (for instant rollback) and an optional candidate.
+
+    The frame loop reads `active` once per frame, so replacing the reference is an atomic
+    swap between frames. Loading and warm-up run in a worker thread.
+    """
+
+    ROUTING_MODES = ('frame', 'session')
+
+    def __init__(self, model_dir: str = "."):
+        # Weights are unpickled on load, so only files inside model_dir may be loaded through the API
+        self.model_dir = os.path.realpath(model_dir)
+        self.active: LoadedModel | None = None
+        self.previous: LoadedModel | None = None
+        self.candidate: LoadedModel | None = None
+
+        # A/B routing: share ของ frame (หรือ session) ที่ส่งไปให้ candidate
+        self.candidate_share = 0.0
+        self.routing_mode = 'frame'
+        self.comparison = ComparisonStats()
+
+        self.loading_path: str | None = None
+        self.last_error: str | None = None
+        self.load_task: asyncio.Task | None = None
+
+    def load_initial(self, path: str):
+        """Load the startup model synchronously"""
+        self.active = load_model(path)
+        logger.info("Model loaded: %s (load %d ms, warm-up %d ms)", path, self.active.load_ms, self.active.warmup_ms)
+
+    @property
+    def is_loading(self) -> bool:
+        return self.loading_path is not None
+
+    async def load(self, path: str, target: str = 'active'):
+        """Load weights in the background and install them as the active model or the candidate"""
+        # One load at a time: start_load sets loading_path synchronously and callers check is_loading
+        self.loading_path = path
+        self.last_error = None
+        try:
+            loaded = await asyncio.to_thread(load_model, path)
+        except Exception as e:
+            self.last_error = f"{path}: {e}"
+            logger.error("❌ Failed to load model %s: %s", path, e)
+            return
+        finally:
+            self.loading_path = None
+
+        if target == 'candidate':
+            self.candidate = loaded
+            self.comparison.reset()
+            logger.info("🧪 Candidate model ready: %s (load %d ms, warm-up %d ms)", path, loaded.load_ms, loaded.warmup_ms)
+        else:
+            self.swap(loaded)
+
+    def resolve_path(self, path: str) -> str:
+        """Resolve a requested weights path (relative to model_dir); rejects paths outside model_dir"""
+        resolved = os.path.realpath(os.path.join(self.model_dir, path))
+        if os.path.commonpath([resolved, self.model_dir]) != self.model_dir:
+            raise PermissionError(f"Model path must be inside {self.model_dir}")
+        if not os.path.isfile(resolved):
+            raise FileNotFoundError(path)
+        return resolved
+
+    def start_load(self, path: str, target: str = 'active') -> asyncio.Task:
+        path = self.resolve_path(path)
+        # Mark as loading right away so a second request is rejected before the task starts
+        self.loading_path = path
+        # Keep a reference so the task isn't garbage collected while loading
+        self.load_task = asyncio.create_task(self.load(path, target))
+        return self.load_task
+
+    def swap(self, new_model: LoadedModel):
+        """Install a new active model, keeping the current one for rollback"""
+        self.previous, self.active = self.active, new_model
+        logger.info("🔄 Active model swapped: %s → %s", self.previous.path if self.previous else None, new_model.path)
+
+    def rollback(self):
+        if self.previous is None:
+            raise ValueError("No previous model to roll back to")
+        self.active, self.previous = self.previous, self.active
+        logger.info("↩️ Rolled back to model: %s", self.active.path)
+
+    def promote_candidate(self):
+        if self.candidate is None:
+            raise ValueError("No candidate model loaded")
+        candidate, self.candidate = self.candidate, None
+        self.candidate_share = 0.0
+        self.comparison.reset()  # stats compared the old pair, they no longer apply
+        self.swap(candidate)
+
+    def discard_candidate(self):
+        if self.candidate is None:
+            raise ValueError("No candidate model loaded")
+        logger.info("🗑️ Candidate model discarded: %s", self.candidate.path)
+        self.candidate = None
+        self.candidate_share = 0.0
+        self.comparison.reset()
+
+    def set_routing(self, share: float, mode: str):
+        if not 0.0 <= share <= 1.0:
+            raise ValueError("Share must be between 0.0 and 1.0")
+        if mode not in self.ROUTING_MODES:
+            raise ValueError(f"Routing mode must be one of {self.ROUTING_MODES}")
+        self.candidate_share = share
+        self.routing_mode = mode
+        logger.info("🔀 Candidate routing: %.0f%% of %ss", share * 100, mode)
+
+    def route(self, session_roll: float) -> tuple[LoadedModel, LoadedModel | None]:
+        """
+        Pick the model that serves this frame.
+
+        Returns (serving, reference). `reference` is the active model when the frame was
+        routed to the candidate, so both results can be compared; otherwise None.
+        `session_roll` is drawn once per camera session and used in 'session' routing mode.
+        """
+        active, candidate = self.active, self.candidate
+        if candidate is None or self.candidate_share <= 0.0:
+            return active, None
+        roll = session_roll if self.routing_mode == 'session' else random.random()
+        if roll < self.candidate_share:
+            return candidate, active
+        return active, None
+
+    def to_dict(self) -> dict:
+        return {
+            'active': self.active.to_dict() if self.active else None,
+            'previous': self.previous.to_dict() if self.previous else None,
+            'candidate': self.candidate.to_dict() if self.candidate else None,
+            'loading': self.loading_path,
+            'last_error': self.last_error,
+            'routing': {'share': self.candidate_share, 'mode': self.routing_mode},
+            'comparison': self.comparison.to_dict()
+        }
@@ -0,0 +1,169 @@
+"""
+On-demand profiling for the running server
+- Sampling profiler: เก็บ stack ของทุก thread เป็นระยะ (sys._current_frames) ตลอดช่วงเวลาที่ขอ
+  แล้วส่งออกเป็น folded stacks (ใช้กับ flamegraph.pl / speedscope ได้) หรือสรุป top stacks
+- Slow-frame log: บันทึก frame ที่ใช้เวลานานกว่า threshold พร้อมเวลาของแต่ละ stage
+
+ทั้งสองอย่างไม่มี overhead เมื่อไม่ได้เปิดใช้ (ไม่มี thread หรือ timer ทำงานอยู่)
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_DURATION = 120  # seconds
+SLOW_FRAME_HISTORY = 50     # จำนวน slow frame ล่าสุดที่เก็บไว้ดูผ่าน API
+
+# Innermost frames of a thread that is blocked waiting (lock/condition, idle to_thread worker,
+# idle event loop). Samples ending here are idle time, not work.
+IDLE_LEAVES = (
+    ('wait', 'threading.py'),
+    ('_wait_for_tstate_lock', 'threading.py'),
+    ('_worker', 'thread.py'),      # concurrent.futures worker waiting for a job
+    ('select', 'selectors.py'),
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def is_idle(stack: tuple) -> bool:
+    """True if the innermost frame of a sampled stack is a blocking wait"""
+    leaf = stack[-1]
+    return any(leaf.startswith(f"{name} ({filename}:") for name, filename in IDLE_LEAVES)
+
+
+def sample_stacks(duration: float, interval: float) -> tuple[Counter, int]:
+    """
+    Sample every thread's stack for `duration` seconds (blocking).
+
+    Returns (Counter of stacks -> sample count, number of sampling rounds). Each stack is a
+    tuple from the thread root to the innermost frame, prefixed with the thread name.
+    """
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    stacks = Counter()
+    rounds = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id) or f"thread-{thread_id}")
+            stacks[tuple(reversed(stack))] += 1
+        rounds += 1
+        time.sleep(interval)
+    return stacks, rounds
+
+
+def to_folded(stacks: Counter) -> str:
+    """Collapsed stack format: 'root;child;leaf count' per line"""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+def summarize(stacks: Counter, rounds: int, top: int = 20, include_idle: bool = False) -> dict:
+    """Top stacks plus per-function self/inclusive sample counts (idle samples excluded by default)"""
+    idle = sum(count for stack, count in stacks.items() if is_idle(stack))
+    if not include_idle:
+        stacks = Counter({stack: count for stack, count in stacks.items() if not is_idle(stack)})
+    total = sum(stacks.values()) or 1
+    self_counts = Counter()
+    inclusive_counts = Counter()
+    for stack, count in stacks.items():
+        self_counts[stack[-1]] += count
+        for label in set(stack[1:]):
+            inclusive_counts[label] += count
+    return {
+        'samples': total,
+        'idle_samples': idle,
+        'idle_included': include_idle,
+        'rounds': rounds,
+        'top_stacks': [
+            {'count': count, 'percent': round(count / total * 100, 2), 'thread': stack[0], 'stack': list(stack[-8:])}
+            for stack, count in stacks.most_common(top)
+        ],
+        'top_self': [
+            {'function': label, 'count': count, 'percent': round(count / total * 100, 2)}
+            for label, count in self_counts.most_common(top)
+        ],
+        'top_inclusive': [
+            {'function': label, 'count': count, 'percent': round(count / total * 100, 2)}
+            for label, count in inclusive_counts.most_common(top)
+        ]
+    }
+
+
+class StageTimer:
+    """Per-stage durations of one frame-loop iteration"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.stages = {}
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = round((now - self._last) * 1000, 2)
+        self._last = now
+
+    @property
+    def total_ms(self) -> float:
+        return round((self._last - self.start) * 1000, 2)
+
+
+class SlowFrameLog:
+    """Logs frame-loop iterations slower than a threshold (disabled when threshold_ms is 0)"""
+
+    def __init__(self):
+        self.threshold_ms = 0.0
+        self.recent = deque(maxlen=SLOW_FRAME_HISTORY)
+        self.frames_checked = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def configure(self, threshold_ms: float):
+        self.threshold_ms = threshold_ms
+        self.recent.clear()
+        self.frames_checked = 0
+
+    def timer(self) -> StageTimer | None:
+        """A StageTimer when enabled, otherwise None so the frame loop skips all timing"""
+        return StageTimer() if self.threshold_ms > 0 else None
+
+    def check(self, timer: StageTimer, frame_id: int):
+        self.frames_checked += 1
+        total = timer.total_ms
+        if total < self.threshold_ms:
+            return
+        breakdown = ", ".join(f"{stage}={ms}ms" for stage, ms in timer.stages.items())
+        logger.warning(
+            "🐢 Slow frame %d: %sms (threshold %sms) | %s", frame_id, total, self.threshold_ms, breakdown,
+            extra={'frame_id': frame_id, 'total_ms': total, 'stages': timer.stages}
+        )
+        self.recent.append({
+            'frame_id': frame_id,
+            'time': time.strftime('%H:%M:%S'),
+            'total_ms': total,
+            'stages': timer.stages
+        })
+
+    def to_dict(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': self.threshold_ms,
+            'frames_checked': self.frames_checked,
+            'slow_frames': list(self.recent)
+        }
@@ -0,0 +1,107 @@
+"""
+Startup readiness tracking
+HTTP app ขึ้นทันที ส่วน component ที่ช้า (heavy imports, YOLO model, database) โหลดใน background
+/ready รายงานสถานะและเวลาโหลดของแต่ละ component
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"  # optional component that is intentionally not available (e.g. no DB credentials)
+
+
+class Component:
+    """Load state of one startup component"""
+
+    def __init__(self, name: str, required: bool):
+        self.name = name
+        self.required = required
+        self.status = PENDING
+        self.error: str | None = None
+        self.started_at: float | None = None
+        self.duration_ms: int | None = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            'status': self.status,
+            'required': self.required,
+            'duration_ms': self.duration_ms,
+            'error': self.error
+        }
+
+
+class Readiness:
+    """Registry of startup components; required ones must be ready before the service is ready"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.components: dict[str, Component] = {}
+
+    def register(self, name: str, required: bool = True) -> Component:
+        self.components[name] = Component(name, required)
+        return self.components[name]
+
+    async def run(self, name: str, loader, *args):
+        """Run a blocking loader in a worker thread and record its status and duration"""
+        component = self.components[name]
+        component.status = LOADING
+        component.started_at = time.time()
+        try:
+            result = await asyncio.to_thread(loader, *args)
+            # A loader may return DISABLED for optional components that were skipped on purpose
+            component.status = DISABLED if result == DISABLED else READY
+        except Exception as e:
+            component.status = FAILED
+            component.error = str(e)
+            logger.error("❌ Startup component '%s' failed: %s", name, e)
+        finally:
+            component.duration_ms = int((time.time() - component.started_at) * 1000)
+            component.done.set()
+        if component.status != FAILED:
+            logger.info("✓ Startup component '%s' %s in %d ms", name, component.status, component.duration_ms)
+        return component.status
+
+    def fail(self, name: str, error: str):
+        """Mark a component as failed without running it (e.g. a dependency failed)"""
+        component = self.components[name]
+        component.status = FAILED
+        component.error = error
+        component.done.set()
+
+    def is_ready(self, name: str) -> bool:
+        component = self.components.get(name)
+        return component is not None and component.status == READY
+
+    def failure(self, name: str) -> str | None:
+        """The error of a failed component, None if it has not failed"""
+        component = self.components[name]
+        return component.error if component.status == FAILED else None
+
+    async def wait(self, name: str, timeout: float) -> bool:
+        """Wait until a component finished loading; True only if it is ready"""
+        component = self.components[name]
+        if not component.done.is_set():
+            try:
+                await asyncio.wait_for(component.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return component.status == READY
+
+    @property
+    def ready(self) -> bool:
+        return all(c.status == READY for c in self.components.values() if c.required)
+
+    def to_dict(self) -> dict:
+        return {
+            'ready': self.ready,
+            'uptime_ms': int((time.time() - self.started_at) * 1000),
+            'components': {name: c.to_dict() for name, c in self.components.items()}
+        }
@@ -0,0 +1,242 @@
+"""
+Shared per-frame output buffer
+Detection loop publish frame ครั้งเดียว แล้วทุก output (WebSocket, MJPEG, SSE) อ่านจาก buffer เดียวกัน
+แต่ละ rendition (JPEG, WebSocket JSON, MJPEG part, SSE event) ถูก encode อย่างมากครั้งเดียวต่อ frame
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+import time
+from contextlib import contextmanager
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for /ws?format=msgpack
+    msgpack = None
+
+# Optimize JPEG encoding: quality 70 reduces size by ~40% with minimal visual loss
+JPEG_QUALITY = 70
+MJPEG_BOUNDARY = "frame"
+
+# Compact protocol (/ws?protocol=delta): full keyframe every N frames (per client) so clients can resync
+KEYFRAME_INTERVAL = 30
+MESSAGE_FORMATS = ('json', 'msgpack')
+
+
+class StreamClosed(Exception):
+    """Raised to consumers when the detection loop stops with an error"""
+
+
+class EncodedFrame:
+    """One processed frame and its lazily encoded renditions"""
+
+    def __init__(self, frame_id: int, image, meta: dict):
+        self.frame_id = frame_id
+        self.timestamp = time.time()
+        self.image = image  # annotated frame (numpy array)
+        self.meta = meta    # detections, fps, prediction stats, ...
+        self._jpeg = None
+        self._b64 = None
+        self._ws_message = None
+        self._mjpeg_part = None
+        self._sse_event = None
+
+        # Compact protocol: messages cached per (base frame_id or None for a keyframe, format)
+        self._compact = None
+        self._users = None
+        self._compact_messages = {}
+
+    @property
+    def jpeg(self) -> bytes:
+        if self._jpeg is None:
+            import cv2  # imported lazily so the module loads without the vision stack
+            _, buffer = cv2.imencode('.jpg', self.image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            self._jpeg = buffer.tobytes()
+        return self._jpeg
+
+    @property
+    def b64(self) -> str:
+        if self._b64 is None:
+            self._b64 = base64.b64encode(self.jpeg).decode('utf-8')
+        return self._b64
+
+    def ws_message(self) -> str:
+        """Full JSON message for /ws (base64 frame + metadata)"""
+        if self._ws_message is None:
+            data = {'frame': self.b64, **self.meta}
+            self._ws_message = json.dumps(data)
+        return self._ws_message
+
+    def mjpeg_part(self) -> bytes:
+        """One part of a multipart/x-mixed-replace stream"""
+        if self._mjpeg_part is None:
+            jpeg = self.jpeg
+            header = (
+                f"--{MJPEG_BOUNDARY}\r\n"
+                f"Content-Type: image/jpeg\r\n"
+                f"Content-Length: {len(jpeg)}\r\n\r\n"
+            ).encode('ascii')
+            self._mjpeg_part = header + jpeg + b"\r\n"
+        return self._mjpeg_part
+
+    def _build_compact(self):
+        """Replace embedded user records with user_id references (done once per frame)"""
+        users = {}
+        compact = dict(self.meta)
+
+        def ref(user):
+            if not user:
+                return None
+            user_id = str(user.get('user_id') or user.get('label'))
+            users[user_id] = user
+            return user_id
+
+        compact['user'] = ref(self.meta.get('user'))
+        compact['prediction_stats'] = {
+            label: {'count': stats['count'], 'percentage': stats['percentage'], 'user': ref(stats.get('user'))}
+            for label, stats in self.meta.get('prediction_stats', {}).items()
+        }
+        self._compact, self._users = compact, users
+
+    @property
+    def compact(self) -> dict:
+        """Metadata with user records replaced by user_id references"""
+        if self._compact is None:
+            self._build_compact()
+        return self._compact
+
+    @property
+    def users(self) -> dict:
+        """user_id -> user record for every user referenced by this frame"""
+        if self._users is None:
+            self._build_compact()
+        return self._users
+
+    def compact_message(self, base_seq: int | None, base: dict | None, fmt: str = 'json'):
+        """
+        Compact protocol message: a keyframe with all fields (base_seq None), or a delta with only
+        the fields that changed since frame `base_seq`, whose compact metadata is `base`.
+        Clients on the same base share one serialization (cached per (base_seq, format)).
+        """
+        key = (base_seq, fmt)
+        if key not in self._compact_messages:
+            if base_seq is None:
+                message = {'type': 'key', 'seq': self.frame_id, 'data': self.compact}
+            else:
+                message = {
+                    'type': 'delta',
+                    'seq': self.frame_id,
+                    'base': base_seq,
+                    'set': {k: v for k, v in self.compact.items() if k not in base or base[k] != v},
+                    'unset': [k for k in base if k not in self.compact]
+                }
+            # JPEG travels as raw bytes in msgpack and as base64 in JSON
+            message['frame'] = self.jpeg if fmt == 'msgpack' else self.b64
+            self._compact_messages[key] = encode_message(message, fmt)
+        return self._compact_messages[key]
+
+    def sse_event(self) -> str:
+        """Server-Sent Event with metadata only (no image)"""
+        if self._sse_event is None:
+            self._sse_event = f"id: {self.frame_id}\nevent: prediction\ndata: {json.dumps(self.meta)}\n\n"
+        return self._sse_event
+
+
+class FrameHub:
+    """
+    Latest-frame broadcast between the detection loop and any number of consumers.
+
+    Consumers always get the newest frame; a slow consumer skips frames instead of queueing them.
+    """
+
+    def __init__(self):
+        self.latest: EncodedFrame | None = None
+        self.error: str | None = None
+        self.subscribers = 0
+        self._ids = itertools.count(1)
+        self._changed = asyncio.Event()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def reset(self):
+        """Clear state before the detection loop (re)starts"""
+        self.latest = None
+        self.error = None
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, frame: EncodedFrame):
+        self.latest = frame
+        self._notify()
+
+    def close(self, error: str):
+        """Stop all consumers with an error message"""
+        self.error = error
+        self._notify()
+
+    @contextmanager
+    def subscribe(self):
+        self.subscribers += 1
+        try:
+            yield self
+        finally:
+            self.subscribers -= 1
+
+    async def next_frame(self, last_id: int | None) -> EncodedFrame:
+        """Wait for a frame newer than `last_id`"""
+        while True:
+            if self.error:
+                raise StreamClosed(self.error)
+            latest = self.latest
+            if latest is not None and latest.frame_id != last_id:
+                return latest
+            await self._changed.wait()
+
+
+def encode_message(message: dict, fmt: str):
+    """Serialize a compact protocol message (str for JSON, bytes for msgpack)"""
+    if fmt == 'msgpack':
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message)
+
+
+class CompactSession:
+    """
+    Per-connection state for the compact protocol: the user records sent and the last frame sent.
+
+    Deltas are computed against the last frame this client received (not the previous published
+    frame), so a client that skips frames keeps getting deltas instead of keyframes.
+    """
+
+    def __init__(self, fmt: str = 'json'):
+        self.fmt = fmt
+        self.sent_users: dict[str, dict] = {}  # user_id -> record as last sent to this client
+        self.last_seq: int | None = None
+        self.last_compact: dict | None = None  # compact metadata of frame last_seq (shared, not copied)
+        self.last_key_seq: int | None = None
+
+    def messages(self, frame: EncodedFrame) -> list:
+        """Messages to send for this frame: user directory updates (if any), then the frame"""
+        out = []
+        keyframe = self.last_seq is None or frame.frame_id - self.last_key_seq >= KEYFRAME_INTERVAL
+        # New or changed records (e.g. after POST/DELETE /users); keyframes resend every referenced user
+        users = {
+            uid: user for uid, user in frame.users.items()
+            if keyframe or self.sent_users.get(uid) != user
+        }
+        if users:
+            out.append(encode_message({'type': 'users', 'users': users}, self.fmt))
+            self.sent_users.update(users)
+        if keyframe:
+            out.append(frame.compact_message(None, None, self.fmt))
+            self.last_key_seq = frame.frame_id
+        else:
+            out.append(frame.compact_message(self.last_seq, self.last_compact, self.fmt))
+        self.last_seq = frame.frame_id
+        self.last_compact = frame.compact
+        return out
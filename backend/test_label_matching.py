@@ -3,7 +3,7 @@ Test script to verify flexible label matching
 Run this to test the database query logic
 """
 import asyncio
-from main import get_user_by_label, get_users_by_labels_batch
+from main import get_user_by_label, get_users_by_labels_batch, init_database
 
 async def test_label_matching():
     """Test various label formats"""
@@ -53,6 +53,8 @@ if __name__ == "__main__":
     print("This tests the flexible label matching logic")
     print("Make sure your .env file has correct SUPABASE credentials\n")
     
+    # Supabase client is created by the server's startup task; create it directly here
+    init_database()
     asyncio.run(test_label_matching())
     
     print("\n✅ Test completed!")
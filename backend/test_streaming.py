@@ -0,0 +1,84 @@
+"""
+Test script for the compact WebSocket protocol (/ws?protocol=delta) (no server, model or camera needed)
+Publishes synthetic frames to a FrameHub and checks what CompactSession sends to each client
+
+Run: python test_streaming.py  (or python -m pytest test_streaming.py)
+"""
+import json
+
+from streaming import FrameHub, EncodedFrame, CompactSession, KEYFRAME_INTERVAL
+
+
+def make_frame(hub: FrameHub, fps: float, user: dict | None = None) -> EncodedFrame:
+    meta = {'fps': fps, 'predicted': 'Poom', 'user': user, 'prediction_stats': {}}
+    frame = EncodedFrame(hub.next_id(), None, meta)
+    frame._jpeg = b'jpeg'  # skip cv2: the image itself is not under test
+    hub.publish(frame)
+    return frame
+
+
+def message_types(messages: list) -> list[str]:
+    return [json.loads(m)['type'] for m in messages]
+
+
+def test_skipping_client_stays_on_deltas():
+    """A client that only receives every 3rd frame gets deltas against the frame it last received"""
+    hub = FrameHub()
+    fast, slow = CompactSession(), CompactSession()
+    sent = []
+    for i in range(12):
+        frame = make_frame(hub, fps=float(i))
+        fast.messages(frame)
+        if i % 3 == 0:
+            sent.append((frame, slow.messages(frame)))
+
+    assert message_types(sent[0][1]) == ['key']
+    for frame, messages in sent[1:]:
+        delta = json.loads(messages[-1])
+        assert delta['type'] == 'delta'
+        assert delta['base'] == frame.frame_id - 3
+        assert delta['set'] == {'fps': frame.meta['fps']}
+
+
+def test_clients_on_same_base_share_serialization():
+    """Clients that received the same previous frame get the same encoded delta object"""
+    hub = FrameHub()
+    a, b = CompactSession(), CompactSession()
+    first = make_frame(hub, fps=1.0)
+    a.messages(first)
+    b.messages(first)
+    second = make_frame(hub, fps=2.0)
+    assert a.messages(second)[-1] is b.messages(second)[-1]
+
+
+def test_periodic_keyframe_per_client():
+    """Each client gets a keyframe on connect and then every KEYFRAME_INTERVAL frames"""
+    hub = FrameHub()
+    session = CompactSession()
+    types = [message_types(session.messages(make_frame(hub, fps=float(i))))[-1] for i in range(KEYFRAME_INTERVAL + 1)]
+    assert types[0] == 'key' and types[KEYFRAME_INTERVAL] == 'key'
+    assert set(types[1:KEYFRAME_INTERVAL]) == {'delta'}
+
+
+def test_changed_user_record_is_resent():
+    """Records are resent when they change (e.g. after POST /users), not only the first time"""
+    hub = FrameHub()
+    session = CompactSession()
+    user = {'user_id': 1, 'label': 'Poom', 'username': 'Poom'}
+    assert message_types(session.messages(make_frame(hub, 1.0, user))) == ['users', 'key']
+    assert message_types(session.messages(make_frame(hub, 2.0, user))) == ['delta']
+    renamed = {**user, 'username': 'Poom S.'}
+    messages = session.messages(make_frame(hub, 3.0, renamed))
+    assert message_types(messages) == ['users', 'delta']
+    assert json.loads(messages[0])['users'] == {'1': renamed}
+
+
+if __name__ == "__main__":
+    print("\n🧪 Compact Protocol Test")
+    print("=" * 60)
+    for test in (test_skipping_client_stays_on_deltas, test_clients_on_same_base_share_serialization,
+                 test_periodic_keyframe_per_client, test_changed_user_record_is_resent):
+        print(f"\n🔍 {test.__doc__ or test.__name__}")
+        test()
+        print("   ✅ PASSED")
+    print("\n✅ Test completed!")
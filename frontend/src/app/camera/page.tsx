@@ -29,12 +29,28 @@ type WSData = {
   predicted?: string; // top identity (string)
   predicted_percentage?: number; // confidence percentage of top prediction
   prediction_stats?: PredictionStats; // all detected people with percentages
-  history_size?: number; // number of detections in 5s window
+  decided?: boolean; // true once the top identity's margin passed the decision threshold
+  margin?: number; // lead of the top identity over the runner-up (percentage points)
+  history_size?: number; // decayed number of recent detections
   log?: string;
   error?: string;
   user?: UserInfo | null; // user info from database
 };
 
+/** Compact protocol (/ws?protocol=delta): users are (re)sent when new or changed and referenced by ID,
+ *  frames carry only the fields that changed since the previous one, with periodic keyframes */
+type CompactMeta = Omit<WSData, "frame" | "user" | "prediction_stats" | "error"> & {
+  user?: string | null; // user_id reference
+  prediction_stats?: {
+    [label: string]: { count: number; percentage: number; user?: string | null };
+  };
+};
+
+type CompactMessage =
+  | { type: "users"; users: { [userId: string]: UserInfo } }
+  | { type: "key"; seq: number; frame?: string; data: CompactMeta }
+  | { type: "delta"; seq: number; base: number; frame?: string; set: Partial<CompactMeta>; unset: string[] };
+
 type Candidate = { 
   name: string; 
   confidence: number; 
@@ -55,22 +71,61 @@ export default function FaceDetectionPage() {
     predicted: "",
     predictedPercentage: 0,
     predictionStats: {} as PredictionStats,
-    historySize: 0,
+    decided: false,
+    margin: 0,
     userInfo: null as UserInfo | null,
     candidates: [] as Candidate[]
   });
 
   const canvasRef = useRef<HTMLCanvasElement>(null);
   const wsRef = useRef<WebSocket | null>(null);
+  // Compact protocol state (reset on every new connection)
+  const usersRef = useRef<{ [userId: string]: UserInfo }>({});
+  const metaRef = useRef<CompactMeta | null>(null);
+  const lastSeqRef = useRef<number | null>(null);
   const shouldReconnectRef = useRef(true); // Flag to control auto-reconnect
 
   // เปลี่ยนปลายทางได้ด้วย NEXT_PUBLIC_WS_URL
-  const wsUrl = useMemo(
-    () => process.env.NEXT_PUBLIC_WS_URL ?? "ws://localhost:8000/ws",
-    []
-  );
+  const wsUrl = useMemo(() => {
+    const base = process.env.NEXT_PUBLIC_WS_URL ?? "ws://localhost:8000/ws";
+    return base + (base.includes("?") ? "&" : "?") + "protocol=delta";
+  }, []);
 
   /** ===== Helpers ===== */
+  // Apply a compact message to the local state and expand it back into the full WSData shape
+  const applyCompact = useCallback((msg: CompactMessage): WSData | null => {
+    if (msg.type === "users") {
+      usersRef.current = { ...usersRef.current, ...msg.users };
+      return null;
+    }
+    let changed: Partial<CompactMeta>;
+    if (msg.type === "key") {
+      metaRef.current = msg.data;
+      changed = msg.data;
+    } else {
+      if (!metaRef.current || msg.base !== lastSeqRef.current) return null; // wait for next keyframe
+      const next: CompactMeta = { ...metaRef.current, ...msg.set };
+      for (const key of msg.unset) delete (next as Record<string, unknown>)[key];
+      metaRef.current = next;
+      changed = msg.set;
+    }
+    lastSeqRef.current = msg.seq;
+
+    const meta = metaRef.current;
+    const users = usersRef.current;
+    const stats: PredictionStats = {};
+    for (const [label, s] of Object.entries(meta.prediction_stats ?? {})) {
+      stats[label] = { count: s.count, percentage: s.percentage, user: s.user ? users[s.user] ?? null : null };
+    }
+    return {
+      ...meta,
+      log: "log" in changed ? meta.log : undefined, // only append a log line when it changed
+      frame: msg.frame,
+      prediction_stats: stats,
+      user: meta.user ? users[meta.user] ?? null : null
+    };
+  }, []);
+
   const clamp01 = (n: number) => Math.max(0, Math.min(1, n));
 
   const normalizeCandidates = useCallback((stats?: PredictionStats): Candidate[] => {
@@ -153,6 +208,9 @@ export default function FaceDetectionPage() {
 
     const ws = new WebSocket(wsUrl);
     wsRef.current = ws;
+    usersRef.current = {};
+    metaRef.current = null;
+    lastSeqRef.current = null;
 
     ws.onopen = () => {
       setStatus("connected");
@@ -164,7 +222,14 @@ export default function FaceDetectionPage() {
     ws.onmessage = (event) => {
       let data: WSData;
       try {
-        data = JSON.parse(event.data);
+        const parsed = JSON.parse(event.data);
+        if (parsed && typeof parsed.type === "string") {
+          const expanded = applyCompact(parsed as CompactMessage);
+          if (!expanded) return;
+          data = expanded;
+        } else {
+          data = parsed;
+        }
       } catch {
         setLogs((p) => [...p.slice(-9), "Invalid JSON from server"]);
         return;
@@ -183,7 +248,8 @@ export default function FaceDetectionPage() {
         predictedPercentage: typeof data.predicted_percentage === "number" 
           ? data.predicted_percentage : prev.predictedPercentage,
         predictionStats: data.prediction_stats || prev.predictionStats,
-        historySize: typeof data.history_size === "number" ? data.history_size : prev.historySize,
+        decided: typeof data.decided === "boolean" ? data.decided : prev.decided,
+        margin: typeof data.margin === "number" ? data.margin : prev.margin,
         userInfo: "user" in data ? (data.user || null) : prev.userInfo,
         candidates: data.prediction_stats ? normalizeCandidates(data.prediction_stats) : prev.candidates
       }));
@@ -230,7 +296,7 @@ export default function FaceDetectionPage() {
       } catch {}
       cleanup("error");
     };
-  }, [wsUrl, reconnectAttempts, drawFrame, normalizeCandidates]);
+  }, [wsUrl, reconnectAttempts, drawFrame, normalizeCandidates, applyCompact]);
 
   const disconnect = useCallback(() => {
     shouldReconnectRef.current = false; // Disable auto-reconnect
@@ -361,7 +427,14 @@ export default function FaceDetectionPage() {
             {/* Top match */}
             <div className="mt-4 rounded-2xl p-4 eye-card">
               <p className="text-sm" style={{ color: 'rgba(255, 255, 255, 0.7)' }}>Top Prediction</p>
-              <div className="mt-1 text-2xl font-bold text-white">{streamData.predicted || "None"}</div>
+              <div className="mt-1 flex items-center gap-2">
+                <div className="text-2xl font-bold text-white">{streamData.predicted || "None"}</div>
+                {streamData.predicted && (
+                  <span className="rounded-full border border-white/20 px-2 py-0.5 text-xs text-white/80">
+                    {streamData.decided ? "✅ Identified" : "⏳ Identifying..."}
+                  </span>
+                )}
+              </div>
               
               {/* Display user info from database if available */}
               {streamData.userInfo ? (
@@ -398,7 +471,7 @@ export default function FaceDetectionPage() {
               <div className="mt-3">
                 <Progress value={streamData.predictedPercentage} />
                 <div className="mt-1 text-xs opacity-70">
-                  Confidence: {streamData.predictedPercentage.toFixed(1)}% ({streamData.historySize} detections)
+                  Vote share: {streamData.predictedPercentage.toFixed(1)}% (lead {streamData.margin.toFixed(1)} pts)
                 </div>
               </div>
             </div>
@@ -429,7 +502,7 @@ export default function FaceDetectionPage() {
             {/* All detected people */}
             <div className="mt-5">
               <p className="mb-2 text-sm opacity-70">
-                All Detected People (Last 5s)
+                All Detected People (Recent, time-weighted)
               </p>
               <div className="grid gap-3">
                 {streamData.candidates.length === 0 && (
@@ -518,7 +591,7 @@ const PersonCard = memo(function PersonCard({
         
         {count !== undefined && (
           <div className="text-xs opacity-60 mt-1">
-            {count} detections
+            ~{Math.round(count)} recent detections
           </div>
         )}
         <div className="mt-1">